@@ -0,0 +1,282 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+# name -> (unit, which direction is better)
+METRICS = {
+    'mdp_sweep_ms': ('ms', 'lower'),
+    'mdp_converge_ms': ('ms', 'lower'),
+    'mdp_retrograde_ms': ('ms', 'lower'),
+    'mc_episodes_per_s': ('episodes/s', 'higher'),
+    'td_episodes_per_s': ('episodes/s', 'higher'),
+    'mdp_best_action_p50_us': ('us', 'lower'),
+    'mdp_best_action_p99_us': ('us', 'lower'),
+    'mc_best_action_p50_us': ('us', 'lower'),
+    'mc_best_action_p99_us': ('us', 'lower'),
+    'td_best_action_p50_us': ('us', 'lower'),
+    'td_best_action_p99_us': ('us', 'lower'),
+    'cold_import_ms': ('ms', 'lower'),
+    'mdp_construct_ms': ('ms', 'lower'),
+    'mc_construct_ms': ('ms', 'lower'),
+    'td_construct_ms': ('ms', 'lower'),
+    'policy_load_us': ('us', 'lower'),
+    'mc_qtable_mb': ('MB', 'lower'),
+    'td_qtable_mb': ('MB', 'lower'),
+    'mc_training_peak_rss_mb': ('MB', 'lower'),
+    'td_training_peak_rss_mb': ('MB', 'lower'),
+}
+DEFAULT_TOLERANCE = 0.5
+
+# Run in a fresh interpreter so the import is really cold.
+STARTUP_SCRIPT = '''
+import json, sys, time
+sys.modules['tkinter'] = None
+start = time.perf_counter()
+from models import MDP, MonteCarlo, TemporalDifference
+timings = {'cold_import_ms': (time.perf_counter() - start) * 1e3}
+for name, cls in [('mdp', MDP), ('mc', MonteCarlo), ('td', TemporalDifference)]:
+    start = time.perf_counter()
+    cls()
+    timings[name + '_construct_ms'] = (time.perf_counter() - start) * 1e3
+print(json.dumps(timings))
+'''
+
+MEMORY_SCRIPT = '''
+import contextlib, io, json, resource, sys
+sys.modules['tkinter'] = None
+from models import {cls}
+
+def peak_rss_kb():
+    # ru_maxrss survives exec on Linux, so it would report the parent's peak;
+    # VmHWM belongs to this process alone.
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+agent = {cls}()
+before = peak_rss_kb()
+with contextlib.redirect_stderr(io.StringIO()):
+    agent.train(num_episodes={episodes}, seed=0)
+after = peak_rss_kb()
+print(json.dumps({{
+    'qtable_mb': sum(Q.nbytes for Q in agent.Q.values()) / 2**20,
+    'peak_rss_mb': (after - before) / 1024,
+}}))
+'''
+
+
+def timed(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_script(script):
+    output = subprocess.run(
+        [sys.executable, '-c', script],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_mdp(results, repeat):
+    from models.utils.statespace import reachable_states
+    from models.utils.value_iteration import ValueIteration
+
+    engine = ValueIteration(reachable_states())
+    V = engine.initial_values()
+    results['mdp_sweep_ms'] = timed(lambda: engine.sweep(V, 1), repeat * 10) * 1e3
+    results['mdp_converge_ms'] = (
+        timed(lambda: engine.policy(engine.run(1, 1e-12), 1), repeat) * 1e3
+    )
+    results['mdp_retrograde_ms'] = timed(lambda: engine.retrograde(1), repeat) * 1e3
+
+
+def bench_training(results, repeat, episodes):
+    from models import MonteCarlo, TemporalDifference
+
+    for name, cls, num_episodes in [
+        ('mc', MonteCarlo, episodes),
+        ('td', TemporalDifference, episodes // 10),
+    ]:
+        agent = cls()
+        with contextlib.redirect_stderr(io.StringIO()):
+            # Warm-up: builds the simulator and pulls in tqdm.
+            agent.train(num_episodes=1_000, seed=0)
+            seconds = timed(
+                lambda: agent.train(num_episodes=num_episodes, seed=0), repeat
+            )
+        results[f'{name}_episodes_per_s'] = num_episodes / seconds
+
+
+def bench_best_action(results, samples):
+    from models import MDP, MonteCarlo, TemporalDifference
+    from models.utils.encoding import decode
+    from models.utils.statespace import reachable_states
+    from models.utils.tables import lookup_tables
+
+    states = reachable_states()
+    states = states[~lookup_tables().terminal[states]]
+    boards = [
+        decode(state)
+        for state in np.random.default_rng(0).choice(states, samples).tolist()
+    ]
+    for name, cls in [('mdp', MDP), ('mc', MonteCarlo), ('td', TemporalDifference)]:
+        agent = cls()
+        latencies = np.empty(samples)
+        for i, board in enumerate(boards):
+            agent.board = board
+            start = time.perf_counter_ns()
+            agent.best_action()
+            latencies[i] = time.perf_counter_ns() - start
+        p50, p99 = np.percentile(latencies, [50, 99]) / 1e3
+        results[f'{name}_best_action_p50_us'] = p50
+        results[f'{name}_best_action_p99_us'] = p99
+
+
+def bench_startup(results, repeat):
+    runs = [run_script(STARTUP_SCRIPT) for _ in range(repeat)]
+    for name in runs[0]:
+        results[name] = min(run[name] for run in runs)
+
+
+def bench_policy_load(results, repeat):
+    from models.mdp import MDP
+    from models.utils.policy_io import PolicyTable
+
+    results['policy_load_us'] = (
+        timed(lambda: PolicyTable.load(MDP.POLICY_FILE), repeat * 100) * 1e6
+    )
+
+
+def bench_memory(results, episodes):
+    for name, cls in [('mc', 'MonteCarlo'), ('td', 'TemporalDifference')]:
+        usage = run_script(MEMORY_SCRIPT.format(cls=cls, episodes=episodes))
+        results[f'{name}_qtable_mb'] = usage['qtable_mb']
+        results[f'{name}_training_peak_rss_mb'] = usage['peak_rss_mb']
+
+
+def run_benchmarks(quick=False):
+    repeat = 1 if quick else 5
+    episodes = 20_000 if quick else 200_000
+    results = {}
+    bench_mdp(results, repeat)
+    bench_training(results, repeat, episodes)
+    bench_best_action(results, 1_000 if quick else 10_000)
+    bench_startup(results, repeat)
+    bench_policy_load(results, repeat)
+    bench_memory(results, episodes)
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'quick': quick,
+        },
+        'results': results,
+    }
+
+
+def compare(results, baseline):
+    # A metric fails when it is worse than the baseline by more than its
+    # tolerance, as a fraction of the baseline value.
+    report = []
+    tolerances = baseline.get('tolerances', {})
+    for name, expected in baseline['results'].items():
+        if name not in results:
+            continue
+        unit, better = METRICS[name]
+        tolerance = tolerances.get(name, baseline.get('tolerance', DEFAULT_TOLERANCE))
+        change = (results[name] - expected) / expected if expected else 0.0
+        worse = change if better == 'lower' else -change
+        report.append((name, unit, expected, results[name], change, worse <= tolerance))
+    return report
+
+
+def print_report(report):
+    for name, unit, expected, value, change, passed in report:
+        status = 'ok' if passed else 'FAIL'
+        print(
+            f'{status:>4}  {name:<28} {value:>12.2f} {unit:<11}'
+            f' baseline {expected:>10.2f} ({change:+.0%})'
+        )
+
+
+def add_arguments(parser):
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument(
+        '--update-baseline',
+        action='store_true',
+        help='store these results as the new baseline',
+    )
+    parser.add_argument(
+        '--quick', action='store_true', help='fewer repeats and episodes'
+    )
+
+
+def run(args):
+    # Tk is never needed here; keep it out so the suite runs on headless
+    # boxes and import timings don't include it.
+    sys.modules['tkinter'] = None
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    results = run_benchmarks(args.quick)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(
+                {
+                    'tolerance': DEFAULT_TOLERANCE,
+                    'tolerances': {},
+                    **results,
+                },
+                f,
+                indent=2,
+            )
+        print(f'Baseline written to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(json.dumps(results['results'], indent=2))
+        return 0
+    with open(args.baseline) as f:
+        report = compare(results['results'], json.load(f))
+    print_report(report)
+    return 0 if all(passed for *_, passed in report) else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the benchmark suite.')
+    add_arguments(parser)
+    return run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,21 +1,281 @@
-from models import MDP, MonteCarlo, TemporalDifference
+import argparse
+import sys
+import time
 
-if __name__ == "__main__":
+# Only `play` opens a window; every other command runs without a display and
+# never imports Tk.
+MENU = ['mdp', 'mc', 'td', 'minimax', 'linear_td']
+MENU_NAMES = [
+    'MDP',
+    'Monte Carlo',
+    'Temporal Difference',
+    'Minimax',
+    'Linear Temporal Difference',
+]
+LEARNERS = ['mdp', 'mc', 'td', 'linear_td']
+# train options a learner has no use for, rejected rather than ignored.
+UNUSED_OPTIONS = {
+    'mdp': [
+        'episodes',
+        'workers',
+        'seed',
+        'epsilon',
+        'alpha',
+        'split_ratio',
+        'batch_size',
+        'checkpoint',
+        'early_stopping',
+    ],
+    'mc': ['alpha'],
+    'linear_td': ['symmetry'],
+}
+
+
+def choose_algorithm():
     print("Choose an algorithm:")
-    print("1. MDP")
-    print("2. Monte Carlo")
-    print("3. Temporal Difference")
+    for number, name in enumerate(MENU_NAMES, 1):
+        print(f"{number}. {name}")
 
     choice = int(input("Enter your choice: "))
+    if not 1 <= choice <= len(MENU):
+        print("Invalid choice. Exiting...")
+        exit()
+    return MENU[choice - 1]
+
+
+def play(args):
+    algorithm = args.algorithm or choose_algorithm()
+    if algorithm == 'mdp':
+        from models import MDP
 
-    if choice == 1:
         game = MDP()
-    elif choice == 2:
-        game = MonteCarlo()
-    elif choice == 3:
-        game = TemporalDifference()
+    elif algorithm == 'mc':
+        from models import MonteCarlo
+
+        game = MonteCarlo(background=True)
+    elif algorithm == 'td':
+        from models import TemporalDifference
+
+        game = TemporalDifference(background=True)
+    elif algorithm == 'minimax':
+        from models import Minimax
+
+        game = Minimax()
     else:
-        print("Invalid choice. Exiting...")
-        exit()
+        from models import LinearTemporalDifference
+
+        game = LinearTemporalDifference(background=True)
 
     game.play()
+
+
+def options(args, **names):
+    # Keyword arguments for the options given on the command line, renamed
+    # from option to parameter name; the rest keep the learner's defaults.
+    values = {name: getattr(args, option) for name, option in names.items()}
+    return {name: value for name, value in values.items() if value is not None}
+
+
+def train(args):
+    from models.utils.metrics import JSONLinesSink, Metrics
+
+    started = time.perf_counter()
+    sink = JSONLinesSink(args.metrics) if args.metrics else None
+    metrics = Metrics(sink) if sink else None
+    episodes = options(
+        args,
+        num_episodes='episodes',
+        split_ratio='split_ratio',
+        batch_size='batch_size',
+        workers='workers',
+    )
+    if args.checkpoint:
+        episodes.update(checkpoint_path=args.checkpoint, resume=args.resume)
+    if args.early_stopping:
+        from models.utils.convergence import EarlyStopping
+
+        episodes['early_stopping'] = EarlyStopping(
+            args.early_stopping, games=args.early_stopping_games
+        )
+
+    if args.algorithm == 'mdp':
+        from models import MDP
+
+        learner = MDP(symmetry=args.symmetry, pretrained=False)
+        learner.train(metrics=metrics, **options(args, gamma='gamma'))
+    elif args.algorithm == 'mc':
+        from models import MonteCarlo
+
+        learner = MonteCarlo(
+            symmetry=args.symmetry,
+            seed=args.seed,
+            pretrained=False,
+            **options(args, epsilon='epsilon'),
+        )
+        learner.train(
+            metrics=metrics, **episodes, **options(args, discount_factor='gamma')
+        )
+    else:
+        if args.algorithm == 'td':
+            from models import TemporalDifference as Learner
+
+            parameters = {'symmetry': args.symmetry}
+        else:
+            from models import LinearTemporalDifference as Learner
+
+            parameters = {}
+        learner = Learner(
+            seed=args.seed,
+            pretrained=False,
+            **parameters,
+            **options(args, epsilon='epsilon', alpha='alpha', gamma='gamma'),
+        )
+        learner.train(metrics=metrics, **episodes)
+    seconds = time.perf_counter() - started
+    if sink:
+        sink.close()
+
+    output = args.output or getattr(learner, 'POLICY_PATH', None) or learner.POLICY_FILE
+    learner.policy.save(output)
+    episodes_done = getattr(learner, 'episodes_done', None)
+    if episodes_done:
+        print(f"Trained on {sum(episodes_done.values()):,} episodes in {seconds:.1f}s")
+    else:
+        print(f"Trained in {seconds:.1f}s")
+    print(f"Policy written to {output}")
+
+
+def evaluate(args):
+    from models.evaluation import run
+
+    run(args)
+
+
+def bench(args):
+    from benchmarks.run import run
+
+    return run(args)
+
+
+def convert(args):
+    import numpy as np
+    from models.utils.policy_io import (
+        ENCODING_BASE3,
+        ENCODING_REACHABLE,
+        NO_ACTION,
+        convert_policy,
+    )
+
+    encoding = {None: None, 'base3': ENCODING_BASE3, 'reachable': ENCODING_REACHABLE}
+    policy = convert_policy(
+        args.source,
+        args.destination,
+        args.algorithm,
+        args.symmetry,
+        encoding[args.encoding],
+    )
+    if args.destination.endswith('.pkl'):
+        # Every board in its own frame, not only the canonical ones.
+        written = int(np.count_nonzero(policy.expanded() != NO_ACTION))
+    else:
+        written = len(policy)
+    print(f"{written:,} moves written to {args.destination}")
+
+
+def parser():
+    from benchmarks.run import add_arguments as bench_arguments
+    from models.evaluation import add_arguments as evaluation_arguments
+    from models.utils.policy_io import ALGORITHMS
+
+    parser = argparse.ArgumentParser(
+        description='Tic Tac Toe with reinforcement learning. '
+        'Without a command, pick an algorithm and play.'
+    )
+    commands = parser.add_subparsers(dest='command')
+
+    command = commands.add_parser('play', help='play against an agent in a window')
+    command.add_argument('algorithm', nargs='?', choices=MENU)
+    command.set_defaults(run=play)
+
+    command = commands.add_parser('train', help='train an agent and save its policy')
+    command.add_argument('algorithm', choices=LEARNERS)
+    command.add_argument('--episodes', type=int, help='episodes to play (MC, TD)')
+    command.add_argument('--workers', type=int, help='training processes (MC, TD)')
+    command.add_argument('--seed', type=int, help='seed for the episodes (MC, TD)')
+    command.add_argument('--output', help='policy file, by default the one played')
+    command.add_argument('--epsilon', type=float)
+    command.add_argument('--alpha', type=float, help='step size (TD)')
+    command.add_argument('--gamma', type=float, help='discount factor')
+    command.add_argument('--split-ratio', type=float, help='share of games as X')
+    command.add_argument('--batch-size', type=int)
+    command.add_argument('--symmetry', action='store_true')
+    command.add_argument('--checkpoint', help='checkpoint file (MC, TD)')
+    command.add_argument(
+        '--resume', action='store_true', help='continue from --checkpoint'
+    )
+    command.add_argument('--metrics', help='append JSON-lines progress records here')
+    command.add_argument(
+        '--early-stopping',
+        type=int,
+        metavar='EVERY',
+        help='stop each seat once it settles, checking every EVERY episodes (MC, TD)',
+    )
+    command.add_argument(
+        '--early-stopping-games',
+        type=int,
+        default=0,
+        help='also require a stable result over this many games against MDP',
+    )
+    command.set_defaults(run=train)
+
+    command = commands.add_parser('eval', help='play two agents against each other')
+    evaluation_arguments(command)
+    command.set_defaults(run=evaluate)
+
+    command = commands.add_parser('bench', help='run the benchmark suite')
+    bench_arguments(command)
+    command.set_defaults(run=bench)
+
+    command = commands.add_parser(
+        'convert', help='convert between .policy files and pickled dicts (.pkl)'
+    )
+    command.add_argument('source')
+    command.add_argument('destination')
+    command.add_argument(
+        '--algorithm', choices=ALGORITHMS, help='algorithm recorded in a .policy file'
+    )
+    command.add_argument(
+        '--symmetry',
+        action='store_true',
+        help='a .pkl source holds canonical boards only',
+    )
+    command.add_argument(
+        '--encoding',
+        choices=['base3', 'reachable'],
+        help='state encoding of a .policy destination',
+    )
+    command.set_defaults(run=convert)
+    return parser
+
+
+def main(argv=None):
+    commands = parser()
+    args = commands.parse_args(argv)
+    if args.command == 'train':
+        for name in UNUSED_OPTIONS.get(args.algorithm, []):
+            value = getattr(args, name)
+            if value is not None and value is not False:
+                option = '--' + name.replace('_', '-')
+                commands.error(f"{option} does not apply to {args.algorithm}")
+        if args.resume and not args.checkpoint:
+            commands.error('--resume needs --checkpoint')
+        if args.algorithm == 'linear_td' and (args.workers or 1) > 1:
+            commands.error('linear_td trains in a single process, without --workers')
+    if args.command is None:
+        args.algorithm = None
+        args.run = play
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,20 @@
-from .mdp import *
-from .mc import *
-from .td import *
+from importlib import import_module
+
+# Learners are imported on first access so that `import models` stays cheap
+# and does not pull in NumPy-heavy modules, tqdm or Tk until they are used.
+_EXPORTS = {
+    'LinearTemporalDifference': '.linear_td',
+    'MDP': '.mdp',
+    'Minimax': '.minimax',
+    'MonteCarlo': '.mc',
+    'TemporalDifference': '.td',
+    'TicTacToe': '.utils',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
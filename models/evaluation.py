@@ -0,0 +1,284 @@
+import argparse
+import math
+import os
+import numpy as np
+from .utils.encoding import NUM_CELLS, NUM_STATES, POW3, decode, index_action
+from .utils.policy_io import NO_ACTION, PolicyTable
+from .utils.random_stream import RandomStream
+from .utils.simulator import BatchSimulator
+from .utils.solver import solver
+from .utils.tables import lookup_tables
+
+# Agents are plain uint8 action tables indexed by encoded board, the same
+# form BatchSimulator uses for its opponent: NO_ACTION entries (all of them
+# for the random agent) fall back to a uniformly random legal move.
+AGENTS = ['mdp', 'mc', 'td', 'linear_td', 'minimax', 'random', 'solver']
+
+
+def policy_paths():
+    from .linear_td import LinearTemporalDifference
+    from .mc import MonteCarlo
+    from .mdp import MDP
+    from .td import TemporalDifference
+
+    return {
+        'mdp': MDP.POLICY_FILE,
+        'mc': MonteCarlo.POLICY_PATH,
+        'td': TemporalDifference.POLICY_PATH,
+        'linear_td': LinearTemporalDifference.POLICY_PATH,
+    }
+
+
+def load_agent(name):
+    # A named agent or the path of a policy file.
+    if name == 'random':
+        return np.full(NUM_STATES, NO_ACTION, dtype=np.uint8)
+    if name == 'solver':
+        return solver().policy()
+    if name == 'minimax':
+        from .minimax import Minimax
+
+        return Minimax().actions()
+    path = policy_paths().get(name, name)
+    if not os.path.exists(path):
+        raise ValueError(f"unknown agent {name!r}")
+    return np.array(PolicyTable.load(path).expanded())
+
+
+def play_games(x_actions, o_actions, num_games, rng):
+    # Plays num_games in lockstep from the empty board. Returns the final
+    # boards and, per seat, how often each (board, action) pair that gives
+    # away a better result was played.
+    tables = lookup_tables()
+    exact = solver()
+    movers = {
+        1: BatchSimulator(x_actions, rng=rng),
+        2: BatchSimulator(o_actions, rng=rng),
+    }
+    blunders = {}
+    codes = np.zeros(num_games, dtype=np.int64)
+    games = np.arange(num_games)
+    for ply in range(NUM_CELLS):
+        if not len(games):
+            break
+        mover = 1 if ply % 2 == 0 else 2
+        current = codes[games]
+        actions = movers[mover].opponent_actions(current)
+
+        wrong = exact.blunders(current, actions)
+        counts = np.bincount(
+            current[wrong] * NUM_CELLS + actions[wrong],
+            minlength=NUM_STATES * NUM_CELLS,
+        )
+        blunders[mover] = blunders[mover] + counts if mover in blunders else counts
+
+        codes[games] = current + mover * POW3[actions]
+        games = games[~tables.terminal[codes[games]]]
+    return codes, blunders
+
+
+def run_worker(x_actions, o_actions, num_games, batch_size, seed):
+    rng = RandomStream(seed)
+    winners = np.zeros(3, dtype=np.int64)
+    blunders = {
+        seat: np.zeros(NUM_STATES * NUM_CELLS, dtype=np.int64) for seat in (1, 2)
+    }
+    for start in range(0, num_games, batch_size):
+        codes, counts = play_games(
+            x_actions, o_actions, min(batch_size, num_games - start), rng
+        )
+        winners += np.bincount(lookup_tables().winner[codes], minlength=3)
+        for seat, seat_counts in counts.items():
+            blunders[seat] += seat_counts
+    return winners, blunders
+
+
+def match(x_actions, o_actions, num_games, workers, batch_size, seeds):
+    # Splits one seat order across a process pool and sums the results.
+    shares = [
+        num_games // workers + (worker < num_games % workers)
+        for worker in range(workers)
+    ]
+    jobs = [
+        (x_actions, o_actions, share, batch_size, seed)
+        for share, seed in zip(shares, seeds.spawn(workers))
+        if share
+    ]
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_worker, *zip(*jobs)))
+    else:
+        results = [run_worker(*job) for job in jobs]
+
+    # Started from zeros, so a seat order with no games still reports arrays.
+    winners = sum((result[0] for result in results), np.zeros(3, dtype=np.int64))
+    blunders = {
+        seat: sum(
+            (result[1][seat] for result in results),
+            np.zeros(NUM_STATES * NUM_CELLS, dtype=np.int64),
+        )
+        for seat in (1, 2)
+    }
+    return winners, blunders
+
+
+def wilson_interval(successes, trials, z=1.96):
+    if not trials:
+        return 0.0, 0.0
+    p = successes / trials
+    centre = p + z * z / (2 * trials)
+    spread = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials))
+    scale = 1 + z * z / trials
+    return (centre - spread) / scale, (centre + spread) / scale
+
+
+def rates(wins, draws, losses):
+    games = wins + draws + losses
+    return {
+        name: {
+            'count': int(count),
+            'rate': count / games if games else 0.0,
+            'ci95': wilson_interval(count, games),
+        }
+        for name, count in [('win', wins), ('draw', draws), ('loss', losses)]
+    }
+
+
+def blunder_list(counts, top):
+    exact = solver()
+    report = []
+    for cell in np.argsort(counts)[::-1][:top].tolist():
+        if not counts[cell]:
+            break
+        state, action = divmod(cell, NUM_CELLS)
+        report.append(
+            {
+                'state': state,
+                'board': decode(state).tolist(),
+                'action': index_action(action),
+                'optimal': [
+                    index_action(a) for a in np.flatnonzero(exact.optimal[state])
+                ],
+                'count': int(counts[cell]),
+            }
+        )
+    return report
+
+
+def evaluate(
+    agent_a,
+    agent_b,
+    num_games=1_000_000,
+    workers=1,
+    batch_size=100_000,
+    seed=None,
+    top=10,
+):
+    # num_games is split evenly between the two seat orders; results are
+    # from agent_a's point of view.
+    tables = {name: load_agent(name) for name in {agent_a, agent_b}}
+    seeds = np.random.SeedSequence(seed)
+    first = num_games // 2
+    orders = [
+        ('as_x', agent_a, agent_b, first),
+        ('as_o', agent_b, agent_a, num_games - first),
+    ]
+
+    seats, blunders = {}, {agent_a: 0, agent_b: 0}
+    for seat, x_name, o_name, games in orders:
+        winners, counts = match(
+            tables[x_name],
+            tables[o_name],
+            games,
+            workers,
+            batch_size,
+            seeds.spawn(1)[0],
+        )
+        a_mark = 1 if seat == 'as_x' else 2
+        seats[seat] = (winners[a_mark], winners[0], winners[3 - a_mark])
+        blunders[x_name] = blunders[x_name] + counts[1]
+        blunders[o_name] = blunders[o_name] + counts[2]
+
+    total = [sum(values) for values in zip(*seats.values())]
+    return {
+        'agents': [agent_a, agent_b],
+        'games': num_games,
+        'overall': rates(*total),
+        'as_x': rates(*seats['as_x']),
+        'as_o': rates(*seats['as_o']),
+        'blunder_totals': {
+            name: {
+                'moves': int(np.sum(counts)),
+                'positions': int(np.count_nonzero(counts)),
+            }
+            for name, counts in blunders.items()
+        },
+        'blunders': {name: blunder_list(blunders[name], top) for name in blunders},
+    }
+
+
+def format_report(report):
+    agent_a, agent_b = report['agents']
+    lines = [f"{agent_a} vs {agent_b}, {report['games']} games"]
+    for label in ['overall', 'as_x', 'as_o']:
+        parts = []
+        for name, result in report[label].items():
+            low, high = result['ci95']
+            parts.append(f"{name} {result['rate']:.2%} [{low:.2%}, {high:.2%}]")
+        lines.append(f"  {label:<8} " + '  '.join(parts))
+    for name, blunders in report['blunders'].items():
+        totals = report['blunder_totals'][name]
+        lines.append(
+            f"  {name}: {totals['moves']} blunders"
+            f" in {totals['positions']} (board, move) pairs"
+        )
+        for blunder in blunders:
+            board = '/'.join(
+                ''.join('.XO'[cell] for cell in row) for row in blunder['board']
+            )
+            lines.append(
+                f"    {board}  played {blunder['action']}"
+                f"  optimal {blunder['optimal']}  x{blunder['count']}"
+            )
+    return '\n'.join(lines)
+
+
+def add_arguments(parser):
+    parser.add_argument('agent_a', help=f"one of {AGENTS} or a policy file")
+    parser.add_argument('agent_b', help=f"one of {AGENTS} or a policy file")
+    parser.add_argument('--games', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--batch-size', type=int, default=100_000)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--top', type=int, default=10, help='blunders to list')
+    parser.add_argument('--json', action='store_true', help='print the raw report')
+
+
+def run(args):
+    report = evaluate(
+        args.agent_a,
+        args.agent_b,
+        args.games,
+        args.workers,
+        args.batch_size,
+        args.seed,
+        args.top,
+    )
+    if args.json:
+        import json
+
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play two agents against each other.')
+    add_arguments(parser)
+    run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+from .td import TemporalDifference
+from .utils.checkpoint import (
+    read_checkpoint,
+    restore_seeds,
+    seed_state,
+    write_checkpoint,
+)
+from .utils.grid import Board
+from .utils.linear_q import LinearQ
+from .utils.policy_io import PolicyTable, merge_actions
+import numpy as np
+
+
+class LinearTemporalDifference(TemporalDifference):
+    # Q-learning with a linear Q function over line features instead of a
+    # table, trained by mini-batch semi-gradient steps. Opponent, simulator,
+    # epsilon-greedy play and the training loop are TemporalDifference's;
+    # the learner state is a dozen weights per player whatever the board.
+    POLICY_PATH = 'models/policies/linear_td_policy.policy'
+
+    def __init__(
+        self,
+        epsilon=0.2,
+        alpha=0.01,
+        gamma=0.9,
+        size=3,
+        k=None,
+        seed=None,
+        background=False,
+        pretrained=True,
+    ):
+        super().__init__(
+            epsilon,
+            alpha,
+            gamma,
+            size=size,
+            k=k,
+            seed=seed,
+            background=background,
+            pretrained=pretrained,
+        )
+
+    def reset_training(self):
+        board = Board(3) if self.grid is None else self.grid
+        self.Q = {
+            player: LinearQ(board, player, codes=self.grid is None)
+            for player in [self.PLAYER_X, self.PLAYER_O]
+        }
+        self.episodes_done = {self.PLAYER_X: 0, self.PLAYER_O: 0}
+        self.seeds = np.random.SeedSequence(self.seed)
+
+    def learn(self, batch):
+        learn_batch(self.Q[self.current_player], batch, self.alpha, self.gamma)
+
+    def save_checkpoint(self, path):
+        arrays = {f'weights_{player}': Q.weights for player, Q in self.Q.items()}
+        meta = {
+            'algorithm': 'linear_td',
+            'board': [self.size, self.k],
+            'epsilon': self.epsilon,
+            'alpha': self.alpha,
+            'gamma': self.gamma,
+            'episodes': {str(p): n for p, n in self.episodes_done.items()},
+            'rng': self.simulator.rng.state,
+            'seeds': seed_state(self.seeds),
+        }
+        write_checkpoint(path, arrays, meta)
+        self.checkpointed = sum(self.episodes_done.values())
+
+    def load_checkpoint(self, path):
+        self.prepare_training()
+        arrays, meta = read_checkpoint(path)
+        if meta['algorithm'] != 'linear_td' or meta['board'] != [self.size, self.k]:
+            raise ValueError(f"{path} is not a checkpoint for this learner")
+        for player in [self.PLAYER_X, self.PLAYER_O]:
+            self.Q[player].weights[:] = arrays[f'weights_{player}']
+        self.epsilon = meta['epsilon']
+        self.episodes_done = {int(p): n for p, n in meta['episodes'].items()}
+        self.simulator.rng.state = meta['rng']
+        self.seeds = restore_seeds(meta['seeds'])
+        self.checkpointed = sum(self.episodes_done.values())
+
+    def training_stats(self, player=None):
+        return {
+            'player': player,
+            'episodes': sum(self.episodes_done.values()),
+            'epsilon': float(self.epsilon),
+            'q_bytes': sum(Q.nbytes for Q in self.Q.values()),
+        }
+
+    def extract_policy(self):
+        return PolicyTable(
+            merge_actions(
+                self.Q[self.PLAYER_X].policy(), self.Q[self.PLAYER_O].policy()
+            ),
+            'linear_td',
+        )
+
+
+def learn_batch(Q, batch, alpha, gamma):
+    # One semi-gradient Q-learning step per time step of the batch, latest
+    # first, so a final reward reaches the earlier moves of the same games
+    # within the batch.
+    last_step = batch.states.shape[1] - 1
+    for t in reversed(range(last_step + 1)):
+        games = np.flatnonzero(t < batch.lengths)
+        if not len(games):
+            continue
+        next_states = np.where(
+            t + 1 < batch.lengths[games],
+            batch.states[games, min(t + 1, last_step)],
+            -1,
+        )
+        targets = batch.rewards[games, t] + gamma * Q.max_values(next_states)
+        Q.update(batch.states[games, t], batch.actions[games, t], targets, alpha)
@@ -1,179 +1,561 @@
-from tqdm import tqdm
 from .utils import TicTacToe
+from .utils.background import BackgroundTraining
+from .utils.checkpoint import (
+    read_checkpoint,
+    restore_seeds,
+    seed_state,
+    write_checkpoint,
+)
+from .utils.encoding import NUM_CELLS, NUM_STATES, action_index, empty_cells, encode
+from .utils.episodes import EpisodeReader
+from .utils.grid import Board, GridGame, GridSimulator
+from .utils.metrics import NULL_METRICS
+from .utils.policy_io import PolicyTable, merge_actions
+from .utils.qtable import QTable
+from .utils.random_stream import RandomStream
+from .utils.simulator import BatchSimulator
+from .utils.sparse_qtable import SparseQTable
+from .utils.statespace import (
+    canonical_action,
+    canonical_states,
+    reachable_states,
+    state_key,
+)
+from .utils.tables import lookup_tables
 import random
 import numpy as np
-import pickle
 from os.path import exists
 
 
-class MonteCarlo(TicTacToe):
-    OPPONENT_POLICY_PATH = 'models/policies/mdp_policy.pkl'
-
-    POLICY_PATH = 'models/policies/mc_policy.pkl'
-
-    def __init__(self, epsilon=0.2):
+class MonteCarlo(GridGame, TicTacToe):
+    OPPONENT_POLICY_PATH = 'models/policies/mdp_policy.policy'
+
+    POLICY_PATH = 'models/policies/mc_policy.policy'
+    # Rows per player of the sparse Q store on boards other than 3x3.
+    Q_CAPACITY = 200_000
+
+    def __init__(
+        self,
+        epsilon=0.2,
+        symmetry=False,
+        size=3,
+        k=None,
+        q_capacity=None,
+        seed=None,
+        background=False,
+        pretrained=True,
+    ):
+        # Any size x size board won by k in a row (k defaults to size) can be
+        # learned against a random opponent. Those learners keep their Q
+        # values in a SparseQTable of q_capacity rows, are only trained on
+        # request and play from Q directly. On 3x3, q_capacity switches the
+        # dense table for a sparse one as well. A seed makes every episode
+        # drawn from then on reproducible; train(seed=...) reseeds a run.
+        # Without a policy file, background=True returns at once and trains
+        # on a thread (see BackgroundTraining) instead of before returning.
+        # pretrained=False neither loads nor trains a policy: the learner
+        # waits for an explicit train().
         super().__init__()
         self.epsilon = epsilon
+        self.symmetry = symmetry
+        self.size = size
+        self.k = size if k is None else k
+        self.grid = None if (size, self.k) == (3, 3) else Board(size, self.k)
+        self.q_capacity = q_capacity
+        self.seed = seed
+        if self.grid is not None and symmetry:
+            raise ValueError("symmetry is only available on the 3x3 board")
         self.target_policy = {}
         self.behavior_policy = self.epsilon_greedy_policy
-        self.opponent_policy = self.load_opponent_policy()
-        self.policy = {}
+        self.opponent_policy = None if self.grid else self.load_opponent_policy()
+        self.simulator = None
+        self.Q = None
+        self.policy = None
         self.current_player = self.PLAYER_X
 
-        if exists(self.POLICY_PATH):
+        if self.grid is not None:
+            self.board = np.zeros((size, size))
+        elif not pretrained:
+            pass
+        elif exists(self.POLICY_PATH):
             self.load_policy()
+        elif background:
+            self.training = BackgroundTraining(self)
         else:
             self.train()
             self.save_policy()
 
     def load_opponent_policy(self):
-        with open(self.OPPONENT_POLICY_PATH, 'rb') as f:
-            return pickle.load(f)
+        return PolicyTable.load(self.OPPONENT_POLICY_PATH)
 
     def opponent_move(self, game):
-        state = tuple(map(tuple, game.board))
-        if state in self.opponent_policy:
-            return self.opponent_policy[state]
+        action = self.opponent_policy.action(encode(game.board))
+        if action is not None:
+            return action
         else:
-            return random.choice(self.possible_actions(state))
+            return random.choice(self.possible_actions(game.board))
 
     def load_policy(self):
-        with open(self.POLICY_PATH, 'rb') as f:
-            self.policy = pickle.load(f)
+        self.policy = PolicyTable.load(self.POLICY_PATH)
 
     def save_policy(self):
-        with open(self.POLICY_PATH, 'wb') as f:
-            pickle.dump(self.policy, f)
+        self.policy.save(self.POLICY_PATH)
 
     def epsilon_greedy_policy(self, state, Q):
-        possible_acts = self.possible_actions(state)
+        # Works on any Q store; with symmetry the values are read from the
+        # canonical board and the moves stay in the frame of `state`.
+        code, transform = state_key(state, self.symmetry)
+        if isinstance(Q, QTable) and Q.index[code] < 0:
+            raise ValueError(f"state {state} has no row in the Q table")
+        possible_acts = empty_cells(state)
         num_actions = len(possible_acts)
         probs = [self.epsilon / num_actions for _ in range(num_actions)]
 
-        if state in Q:
-            q_values = [Q[state].get(action, 0) for action in possible_acts]
-            if sum(q_values) != 0:
-                max_val = max(q_values)
-                best_actions = [idx for idx, q in enumerate(q_values) if q == max_val]
-                for idx in best_actions:
-                    probs[idx] += (1.0 - self.epsilon) / len(best_actions)
-
-        total = sum(probs)
-        probs = [p / total for p in probs]
+        q_values = Q.get(
+            np.full(num_actions, code),
+            [action_index(canonical_action(a, transform)) for a in possible_acts],
+        ).tolist()
+        max_val = max(q_values)
+        best_actions = [idx for idx, q in enumerate(q_values) if q == max_val]
+        for idx in best_actions:
+            probs[idx] += (1.0 - self.epsilon) / len(best_actions)
 
         return probs, possible_acts
 
-    def simulate_result(self, game, action):
-        new_game = TicTacToe()
-        new_game.board = np.copy(game.board)
-        new_game.board[action[0]][action[1]] = (
-            self.PLAYER_X if not game.x_is_human else self.PLAYER_O
-        )
-        return new_game
-
-    def generate_episode(self, Q):
-        current_game = TicTacToe()
-        states, actions, rewards, probs = [], [], [], []
-
-        while not current_game.terminal(current_game.board):
-            state = tuple(map(tuple, current_game.board))
-
-            current_player = (
-                self.PLAYER_X
-                if (sum(sum(current_game.board)) % 2 == 0)
-                else self.PLAYER_O
-            )
-
-            if current_player == self.current_player:
-                action_probs, possible_acts = self.epsilon_greedy_policy(state, Q)
-                chosen_index = np.random.choice(len(possible_acts), p=action_probs)
-                action = possible_acts[chosen_index]
-                chosen_prob = action_probs[chosen_index]
-
-            else:
-                action = self.opponent_move(current_game)
-                possible_acts = self.possible_actions(state)
-                action_probs = [1.0 if act == action else 0.0 for act in possible_acts]
-                chosen_prob = 1.0 if action in possible_acts else 0.0
-
-            next_game = self.simulate_result(current_game, action)
-
-            if next_game.terminal(next_game.board):
-                winner = next_game.winner(next_game.board)
-                if winner == self.PLAYER_X:
-                    reward = 1 if self.current_player == self.PLAYER_X else -1
-                elif winner == self.PLAYER_O:
-                    reward = -1 if self.current_player == self.PLAYER_O else 1
-                else:
-                    reward = 0
+    def prepare_training(self):
+        # Simulation tables and the learner state are only built once
+        # training is actually needed.
+        if self.simulator is None:
+            if self.grid is not None:
+                self.simulator = GridSimulator(self.grid, rng=RandomStream(self.seed))
             else:
-                reward = 0
-
-            states.append(state)
-            actions.append(action)
-            rewards.append(reward)
-            probs.append(chosen_prob)
-
-            current_game = next_game
+                self.simulator = BatchSimulator(
+                    self.opponent_policy, self.symmetry, RandomStream(self.seed)
+                )
+        if self.Q is None:
+            self.reset_training()
 
-        return states, actions, rewards, probs
+    def new_qtable(self):
+        if self.grid is not None:
+            return SparseQTable(
+                self.grid.num_cells, self.q_capacity or self.Q_CAPACITY, self.grid.legal
+            )
+        if self.q_capacity is not None:
+            return SparseQTable(
+                NUM_CELLS,
+                self.q_capacity,
+                lookup_tables().empty.__getitem__,
+                num_states=NUM_STATES,
+            )
+        return QTable(canonical_states() if self.symmetry else reachable_states())
+
+    def reset_training(self):
+        self.Q = {self.PLAYER_X: self.new_qtable(), self.PLAYER_O: self.new_qtable()}
+        self.C = {player: np.zeros(Q.values.shape) for player, Q in self.Q.items()}
+        for player, Q in self.Q.items():
+            Q.attach(self.C[player])
+        self.episodes_done = {self.PLAYER_X: 0, self.PLAYER_O: 0}
+        self.seeds = np.random.SeedSequence(self.seed)
+
+    def save_checkpoint(self, path):
+        arrays = {}
+        for player in [self.PLAYER_X, self.PLAYER_O]:
+            Q = self.Q[player]
+            arrays[f'values_{player}'] = Q.values
+            arrays[f'visited_{player}'] = Q.visited
+            arrays[f'C_{player}'] = self.C[player]
+            if isinstance(Q, SparseQTable):
+                arrays[f'states_{player}'] = Q.states
+                arrays[f'counts_{player}'] = Q.counts
+        meta = {
+            'algorithm': 'mc',
+            'symmetry': self.symmetry,
+            'board': [self.size, self.k],
+            'epsilon': self.epsilon,
+            'episodes': {str(p): n for p, n in self.episodes_done.items()},
+            'rng': self.simulator.rng.state,
+            'seeds': seed_state(self.seeds),
+        }
+        write_checkpoint(path, arrays, meta)
+        self.checkpointed = sum(self.episodes_done.values())
+
+    def load_checkpoint(self, path):
+        self.prepare_training()
+        arrays, meta = read_checkpoint(path)
+        if (
+            meta['algorithm'] != 'mc'
+            or meta['symmetry'] != self.symmetry
+            or meta.get('board', [3, 3]) != [self.size, self.k]
+        ):
+            raise ValueError(f"{path} is not a checkpoint for this learner")
+        for player in [self.PLAYER_X, self.PLAYER_O]:
+            self.Q[player].restore(
+                arrays[f'values_{player}'],
+                arrays[f'visited_{player}'],
+                arrays.get(f'states_{player}'),
+                arrays.get(f'counts_{player}'),
+            )
+            self.C[player][:] = arrays[f'C_{player}']
+        self.epsilon = meta['epsilon']
+        self.episodes_done = {int(p): n for p, n in meta['episodes'].items()}
+        self.simulator.rng.state = meta['rng']
+        self.seeds = restore_seeds(meta['seeds'])
+        self.checkpointed = sum(self.episodes_done.values())
+
+    def checkpoint(self, path, every):
+        if path is not None and (
+            sum(self.episodes_done.values()) - self.checkpointed >= every
+        ):
+            self.save_checkpoint(path)
+
+    def training_stats(self, player=None):
+        return {
+            'player': player,
+            'episodes': sum(self.episodes_done.values()),
+            'epsilon': float(self.epsilon),
+            'q_entries': int(sum(Q.visited.sum() for Q in self.Q.values())),
+            'q_states': int(sum(Q.visited.any(axis=1).sum() for Q in self.Q.values())),
+            'q_bytes': sum(Q.nbytes for Q in self.Q.values())
+            + sum(C.nbytes for C in self.C.values()),
+        }
 
-    def train(self, discount_factor=0.9, num_episodes=1_000_000, split_ratio=0.5):
-        Q = {self.PLAYER_X: {}, self.PLAYER_O: {}}
-        C = {self.PLAYER_X: {}, self.PLAYER_O: {}}
+    def generate_episode(self, Q):
+        self.prepare_training()
+        episode = self.simulator.run(Q, self.current_player, 1, self.epsilon)
+        return episode.episode(0)
+
+    def update(self, Q, C, batch, discount_factor):
+        weight_sum, return_sum = importance_sampling_sums(Q, batch, discount_factor)
+        merge_importance_sampling(Q, C, weight_sum, return_sum)
+        self.epsilon = decay_epsilon(self.epsilon, batch.lengths.sum())
+
+    def train(
+        self,
+        discount_factor=0.9,
+        num_episodes=1_000_000,
+        split_ratio=0.5,
+        batch_size=1000,
+        workers=1,
+        sync_every=None,
+        seed=None,
+        checkpoint_path=None,
+        checkpoint_every=100_000,
+        resume=False,
+        extend=False,
+        metrics=None,
+        early_stopping=None,
+    ):
+        # resume picks up the checkpoint at checkpoint_path, if there is one,
+        # and trains until num_episodes have been played in total. extend
+        # keeps the current Q and C and plays num_episodes more on top. With an
+        # EarlyStopping, each seat stops as soon as it has settled.
+        from tqdm import tqdm
+
+        if metrics is None:
+            metrics = NULL_METRICS
+        self.prepare_training()
+        self.simulator.metrics = metrics
+        if resume and checkpoint_path is not None and exists(checkpoint_path):
+            self.load_checkpoint(checkpoint_path)
+        else:
+            if not extend:
+                self.reset_training()
+            if seed is not None:
+                self.simulator.rng = RandomStream(seed)
+                self.seeds = np.random.SeedSequence(seed)
+        self.checkpointed = sum(self.episodes_done.values())
+        if workers > 1 and isinstance(self.Q[self.PLAYER_X], SparseQTable):
+            raise ValueError("parallel training needs the dense Q table")
 
         x_episodes = int(split_ratio * num_episodes)
         o_episodes = num_episodes - x_episodes
+        episodes = {self.PLAYER_X: x_episodes, self.PLAYER_O: o_episodes}
+        if extend:
+            for player in episodes:
+                episodes[player] += self.episodes_done[player]
+
+        if workers > 1 and early_stopping is not None:
+            raise ValueError("early stopping needs workers=1")
+        if workers > 1:
+            self.train_parallel(
+                episodes,
+                discount_factor,
+                batch_size,
+                workers,
+                sync_every,
+                checkpoint_path,
+                checkpoint_every,
+                metrics,
+            )
+        else:
+            for player in [self.PLAYER_X, self.PLAYER_O]:
+                self.current_player = player
+                if early_stopping is not None:
+                    early_stopping.start(self, player)
+                with tqdm(
+                    total=episodes[player], initial=self.episodes_done[player]
+                ) as progress:
+                    while self.episodes_done[player] < episodes[player]:
+                        with metrics.phase('simulation'):
+                            batch = self.simulator.run(
+                                self.Q[player],
+                                player,
+                                min(
+                                    batch_size,
+                                    episodes[player] - self.episodes_done[player],
+                                ),
+                                self.epsilon,
+                            )
+                        with metrics.phase('update'):
+                            self.update(
+                                self.Q[player], self.C[player], batch, discount_factor
+                            )
+                            self.Q[player].maintain()
+                        self.episodes_done[player] += len(batch)
+                        progress.update(len(batch))
+                        if metrics.enabled:
+                            metrics.observe(
+                                'importance_weight', importance_weights(batch)
+                            )
+                        metrics.episodes(
+                            len(batch),
+                            batch.rewards.sum(),
+                            lambda: self.training_stats(player),
+                        )
+                        self.checkpoint(checkpoint_path, checkpoint_every)
+                        if early_stopping is not None and early_stopping.check(
+                            self, player, metrics
+                        ):
+                            break
+
+        metrics.flush(self.training_stats)
+        if checkpoint_path is not None:
+            self.save_checkpoint(checkpoint_path)
+        if self.grid is None:
+            self.policy = self.extract_policy()
+
+    def train_offline(
+        self, directories, discount_factor=0.9, batch_size=10_000, metrics=None
+    ):
+        # Replays episode logs written by record_episodes through the weighted
+        # importance sampling update, one batch in memory at a time. The
+        # logged behaviour probabilities make any log usable, whatever Q and
+        # epsilon generated it. Continues from the current Q and C.
+        if metrics is None:
+            metrics = NULL_METRICS
+        if isinstance(directories, str):
+            directories = [directories]
+        self.prepare_training()
+        readers = [EpisodeReader(directory) for directory in directories]
+        for reader in readers:
+            reader.check(self)
 
-        for player, episodes in [
-            (self.PLAYER_X, x_episodes),
-            (self.PLAYER_O, o_episodes),
-        ]:
-            self.current_player = player
-            for _ in tqdm(range(episodes)):
-                states, actions, rewards, behavior_probs = self.generate_episode(
-                    Q[player]
-                )
-                G = 0
-                W = 1
-                for state, action, reward, prob in zip(
-                    reversed(states),
-                    reversed(actions),
-                    reversed(rewards),
-                    reversed(behavior_probs),
-                ):
-                    G = discount_factor * G + reward
-
-                    if state not in C[player]:
-                        C[player][state] = {}
-                    if state not in Q[player]:
-                        Q[player][state] = {}
-
-                    if action not in C[player][state]:
-                        C[player][state][action] = 0
-                    if action not in Q[player][state]:
-                        Q[player][state][action] = 0
-
-                    C[player][state][action] += W
-                    Q[player][state][action] += (W / C[player][state][action]) * (
-                        G - Q[player][state][action]
+        for player in [self.PLAYER_X, self.PLAYER_O]:
+            Q, C = self.Q[player], self.C[player]
+            for reader in readers:
+                for batch in reader.batches(player, batch_size):
+                    with metrics.phase('update'):
+                        weight_sum, return_sum = importance_sampling_sums(
+                            Q, batch, discount_factor
+                        )
+                        merge_importance_sampling(Q, C, weight_sum, return_sum)
+                        Q.maintain()
+                    self.episodes_done[player] += len(batch)
+                    metrics.episodes(
+                        len(batch),
+                        batch.rewards.sum(),
+                        lambda: self.training_stats(player),
                     )
-                    W *= 1.0 / prob
 
-                    self.epsilon = max(0.1, self.epsilon * 0.999999)
+        metrics.flush(self.training_stats)
+        if self.grid is None:
+            self.policy = self.extract_policy()
+
+    def extract_policy(self):
+        return PolicyTable(
+            merge_actions(
+                self.Q[self.PLAYER_X].policy(), self.Q[self.PLAYER_O].policy()
+            ),
+            'mc',
+            self.symmetry,
+        )
 
-        self.policy = {}
-        for player in [self.PLAYER_X, self.PLAYER_O]:
-            self.policy.update(
-                {
-                    state: max(Q[player][state], key=Q[player][state].get)
-                    for state in Q[player]
-                }
-            )
+    def train_parallel(
+        self,
+        episodes,
+        discount_factor,
+        batch_size,
+        workers,
+        sync_every,
+        checkpoint_path,
+        checkpoint_every,
+        metrics,
+    ):
+        # Each round hands the merged Q/C to every worker, for both players at
+        # once; workers return their raw weight and weighted-return sums, which
+        # merge exactly under the weighted importance sampling rule.
+        # Checkpoints can only be taken between rounds, so without sync_every
+        # the rounds are sized to the checkpoint interval. Worker time shows
+        # up as the 'workers' phase, merging as 'update'.
+        from concurrent.futures import ProcessPoolExecutor
+        from tqdm import tqdm
+
+        if sync_every is None and checkpoint_path is not None:
+            sync_every = -(-checkpoint_every // (2 * workers))
+        remaining = {
+            player: max(0, total - self.episodes_done[player])
+            for player, total in episodes.items()
+        }
+        with ProcessPoolExecutor(max_workers=workers) as pool, tqdm(
+            total=sum(episodes.values()), initial=sum(self.episodes_done.values())
+        ) as progress:
+            while any(remaining.values()):
+                futures = []
+                for player, left in remaining.items():
+                    round_episodes = (
+                        left if sync_every is None else min(left, sync_every * workers)
+                    )
+                    remaining[player] -= round_episodes
+                    for worker in range(workers):
+                        share = round_episodes // workers + (
+                            worker < round_episodes % workers
+                        )
+                        if not share:
+                            continue
+                        futures.append(
+                            (
+                                share,
+                                pool.submit(
+                                    run_worker,
+                                    player,
+                                    self.Q[player].states,
+                                    self.Q[player].values,
+                                    self.Q[player].visited,
+                                    self.C[player],
+                                    self.simulator.opponent,
+                                    self.symmetry,
+                                    self.epsilon,
+                                    discount_factor,
+                                    share,
+                                    batch_size,
+                                    self.seeds.spawn(1)[0],
+                                ),
+                            )
+                        )
+
+                steps = 0
+                for share, future in futures:
+                    with metrics.phase('workers'):
+                        (
+                            player,
+                            weight_sum,
+                            return_sum,
+                            worker_steps,
+                            outcome,
+                        ) = future.result()
+                    with metrics.phase('update'):
+                        merge_importance_sampling(
+                            self.Q[player], self.C[player], weight_sum, return_sum
+                        )
+                    self.episodes_done[player] += share
+                    steps += worker_steps
+                    progress.update(share)
+                    metrics.episodes(
+                        share, outcome, lambda: self.training_stats(player)
+                    )
+                self.epsilon = decay_epsilon(self.epsilon, steps)
+                self.checkpoint(checkpoint_path, checkpoint_every)
 
     def best_action(self):
-        state = tuple(map(tuple, self.board))
-        if state in self.policy:
-            return self.policy[state]
+        if self.grid is not None:
+            return self.grid_action()
+        action = self.policy.action(encode(self.board))
+        if action is not None:
+            return action
         else:
-            return random.choice(self.possible_actions(state))
+            return random.choice(self.possible_actions(self.board))
+
+
+def decay_epsilon(epsilon, steps):
+    return max(0.1, epsilon * 0.999999**steps)
+
+
+def importance_weights(batch):
+    # Importance ratio of each whole episode: the greedy target policy over
+    # the behaviour policy's probabilities of the moves played (padding
+    # steps have probability 1).
+    return 1.0 / batch.probs.prod(axis=1)
+
+
+def importance_sampling_sums(Q, batch, discount_factor):
+    # Per (state, action) sums of the weights W and of W * G over a batch,
+    # walking each episode backwards as in off-policy Monte Carlo control.
+    G = np.zeros(len(batch))
+    W = np.ones(len(batch))
+    cells, weights, returns = [], [], []
+    num_actions = Q.values.shape[1]
+    for t in reversed(range(batch.states.shape[1])):
+        valid = t < batch.lengths
+        G = np.where(valid, discount_factor * G + batch.rewards[:, t], G)
+        # A sparse table gives new states a row here; -1 means it is full.
+        rows = Q.rows(batch.states[valid, t], insert=True)
+        kept = rows >= 0
+        cells.append(rows[kept] * num_actions + batch.actions[valid, t][kept])
+        weights.append(W[valid][kept])
+        returns.append((W[valid] * G[valid])[kept])
+        W = np.where(valid, W / batch.probs[:, t], W)
+
+    cells = np.concatenate(cells)
+    size = Q.values.size
+    weight_sum = np.bincount(cells, np.concatenate(weights), minlength=size)
+    return_sum = np.bincount(cells, np.concatenate(returns), minlength=size)
+    return weight_sum.reshape(Q.values.shape), return_sum.reshape(Q.values.shape)
+
+
+def merge_importance_sampling(Q, C, weight_sum, return_sum):
+    # With C the running sum of weights, Q is the W-weighted mean of the
+    # returns, so any set of sums folds in as
+    # Q <- (C * Q + sum(W * G)) / (C + sum(W)).
+    rows, actions = np.nonzero(weight_sum)
+    total = C[rows, actions] + weight_sum[rows, actions]
+    Q.values[rows, actions] = (
+        Q.values[rows, actions] * C[rows, actions] + return_sum[rows, actions]
+    ) / total
+    Q.visited[rows, actions] = True
+    C[rows, actions] = total
+
+
+def run_worker(
+    player,
+    states,
+    values,
+    visited,
+    C,
+    opponent,
+    symmetry,
+    epsilon,
+    discount_factor,
+    num_episodes,
+    batch_size,
+    seed,
+):
+    Q = QTable(states)
+    Q.values[:] = values
+    Q.visited[:] = visited
+    simulator = BatchSimulator(opponent, symmetry, RandomStream(seed))
+
+    weight_total = np.zeros(Q.values.shape)
+    return_total = np.zeros(Q.values.shape)
+    steps = 0
+    outcome = 0.0
+    for start in range(0, num_episodes, batch_size):
+        batch = simulator.run(Q, player, min(batch_size, num_episodes - start), epsilon)
+        weight_sum, return_sum = importance_sampling_sums(Q, batch, discount_factor)
+        merge_importance_sampling(Q, C, weight_sum, return_sum)
+        weight_total += weight_sum
+        return_total += return_sum
+        epsilon = decay_epsilon(epsilon, batch.lengths.sum())
+        steps += batch.lengths.sum()
+        outcome += batch.rewards.sum()
+
+    return player, weight_total, return_total, steps, outcome
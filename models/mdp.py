@@ -1,30 +1,28 @@
 from .utils import TicTacToe
+from .utils.encoding import decode, encode
+from .utils.metrics import NULL_METRICS
+from .utils.policy_io import NO_ACTION, PolicyTable
+from .utils.statespace import canonical_states, reachable_states
+from .utils.tables import lookup_tables
+from .utils.value_iteration import ValueIteration
+import time
 import numpy as np
-from tqdm import tqdm
-import pickle
 from os.path import exists
 
 
 class MDP(TicTacToe):
-    POLICY_FILE = 'models/policies/mdp_policy.pkl'
+    POLICY_FILE = 'models/policies/mdp_policy.policy'
 
-    def __init__(self):
+    def __init__(self, symmetry=False, pretrained=True):
+        # pretrained=False leaves the policy unset until train() is called.
         super().__init__()
-        self.states = self.generate_all_states()
+        self.symmetry = symmetry
         self.V = {}
-        for state in self.states:
-            if self.terminal(state):
-                if self.winner(state) == self.PLAYER_X:
-                    self.V[tuple(map(tuple, state))] = 1
-                elif self.winner(state) == self.PLAYER_O:
-                    self.V[tuple(map(tuple, state))] = -1
-                else:
-                    self.V[tuple(map(tuple, state))] = 0
-            else:
-                self.V[tuple(map(tuple, state))] = 0
-        self.policy = {}
-
-        if exists(self.POLICY_FILE):
+        self.policy = None
+
+        if not pretrained:
+            pass
+        elif exists(self.POLICY_FILE):
             self.load_policy()
         else:
             self.train()
@@ -36,129 +34,63 @@ class MDP(TicTacToe):
         return new_state
 
     def reward(self, state, player):
-        winner = self.winner(state)
-        if winner == player:
-            return 1
-        elif winner is not None:
-            return -1
-        else:
-            # Intermediate rewards/punishments
-            for i in range(3):
-                if (
-                    np.count_nonzero(state[i, :] == player) == 2
-                    and np.count_nonzero(state[i, :] == 0) == 1
-                ):
-                    return 0.5
-                if (
-                    np.count_nonzero(state[:, i] == player) == 2
-                    and np.count_nonzero(state[:, i] == 0) == 1
-                ):
-                    return 0.5
-                if (
-                    np.count_nonzero(np.diag(state) == player) == 2
-                    and np.count_nonzero(np.diag(state) == 0) == 1
-                ):
-                    return 0.5
-                if (
-                    np.count_nonzero(np.diag(np.fliplr(state)) == player) == 2
-                    and np.count_nonzero(np.diag(np.fliplr(state)) == 0) == 1
-                ):
-                    return 0.5
-
-                if (
-                    np.count_nonzero(state[i, :] == 3 - player) == 2
-                    and np.count_nonzero(state[i, :] == 0) == 1
-                ):
-                    return -0.5
-                if (
-                    np.count_nonzero(state[:, i] == 3 - player) == 2
-                    and np.count_nonzero(state[:, i] == 0) == 1
-                ):
-                    return -0.5
-                if (
-                    np.count_nonzero(np.diag(state) == 3 - player) == 2
-                    and np.count_nonzero(np.diag(state) == 0) == 1
-                ):
-                    return -0.5
-                if (
-                    np.count_nonzero(np.diag(np.fliplr(state)) == 3 - player) == 2
-                    and np.count_nonzero(np.diag(np.fliplr(state)) == 0) == 1
-                ):
-                    return -0.5
-            return 0
+        return lookup_tables().shaped_reward[encode(state), player]
 
     def generate_all_states(self):
-        states = []
-        for values in np.ndindex(3, 3, 3, 3, 3, 3, 3, 3, 3):
-            state = np.array(values).reshape(3, 3)
-            if 0 <= np.count_nonzero(state == 1) - np.count_nonzero(state == 2) <= 1:
-                states.append(state)
-        return states
+        return [decode(state) for state in reachable_states()]
 
     def current_player(self, state):
-        if np.count_nonzero(state == 1) == np.count_nonzero(state == 2):
-            return 1
-        else:
-            return 2
-
-    def train(self, gamma=1, theta=1e-12):
-        while True:
-            delta = 0
-            for state in tqdm(self.states, desc="Value Iteration", leave=False):
-                if self.terminal(state):
-                    continue
-
-                v = self.V[tuple(map(tuple, state))]
-                values = []
-                actions = self.possible_actions(state)
-
-                for action in actions:
-                    next_state = self.result(state, action, self.current_player(state))
-                    reward_val = self.reward(
-                        next_state, self.current_player(next_state)
-                    )
-                    values.append(
-                        reward_val + gamma * self.V[tuple(map(tuple, next_state))]
-                    )
-
-                if self.current_player(state) == self.PLAYER_X:
-                    self.V[tuple(map(tuple, state))] = max(values)
-                    self.policy[tuple(map(tuple, state))] = actions[np.argmax(values)]
-                else:
-                    self.V[tuple(map(tuple, state))] = min(values)
-                    self.policy[tuple(map(tuple, state))] = actions[np.argmin(values)]
-
-                delta = max(delta, abs(v - self.V[tuple(map(tuple, state))]))
-
-            if delta < theta:
-                break
-
-        for state in self.states:
-            if self.terminal(state):
-                continue
-            values = []
-            actions = self.possible_actions(state)
-
-            for action in actions:
-                next_state = self.result(state, action, self.current_player(state))
-                reward_val = self.reward(next_state, self.current_player(next_state))
-                values.append(
-                    reward_val + gamma * self.V[tuple(map(tuple, next_state))]
+        return int(lookup_tables().player[encode(state)])
+
+    def train(self, gamma=1, theta=1e-12, metrics=None, method='retrograde'):
+        # 'retrograde' solves the game in one backward pass over the piece
+        # count layers; 'sweeps' runs value iteration to within theta.
+        if metrics is None:
+            metrics = NULL_METRICS
+        engine = ValueIteration(reachable_states())
+        started = time.perf_counter()
+
+        if method == 'retrograde':
+
+            def report(pieces, states):
+                metrics.emit(
+                    'layer',
+                    pieces=pieces,
+                    states=states,
+                    seconds=time.perf_counter() - started,
                 )
 
-            if self.current_player(state) == self.PLAYER_X:
-                self.policy[tuple(map(tuple, state))] = actions[np.argmax(values)]
-            else:
-                self.policy[tuple(map(tuple, state))] = actions[np.argmin(values)]
+            V, actions = engine.retrograde(gamma, report if metrics.enabled else None)
+        elif method == 'sweeps':
+
+            def report(sweep, delta):
+                metrics.emit(
+                    'sweep',
+                    sweep=sweep,
+                    delta=float(delta),
+                    seconds=time.perf_counter() - started,
+                )
+
+            V = engine.run(gamma, theta, report if metrics.enabled else None)
+            actions = engine.policy(V, gamma)
+        else:
+            raise ValueError(f"unknown training method {method!r}")
+
+        # The shaped reward is not invariant under board symmetries, so values
+        # are always solved on the full state space; symmetry only shrinks
+        # what is kept to one representative per equivalence class.
+        states = canonical_states() if self.symmetry else engine.states
+        self.V = dict(zip(states.tolist(), V[states].tolist()))
+        policy = np.full(len(actions), NO_ACTION, dtype=np.uint8)
+        kept = states[actions[states] >= 0]
+        policy[kept] = actions[kept]
+        self.policy = PolicyTable(policy, 'mdp', self.symmetry)
 
     def best_action(self):
-        state = self.board
-        return self.policy[tuple(map(tuple, state))]
+        return self.policy.action(encode(self.board))
 
     def save_policy(self):
-        with open(self.POLICY_FILE, 'wb') as f:
-            pickle.dump(self.policy, f)
+        self.policy.save(self.POLICY_FILE)
 
     def load_policy(self):
-        with open(self.POLICY_FILE, 'rb') as f:
-            self.policy = pickle.load(f)
+        self.policy = PolicyTable.load(self.POLICY_FILE)
@@ -0,0 +1,215 @@
+from .utils import TicTacToe
+from .utils.encoding import NUM_CELLS, NUM_STATES, POW3, encode, index_action
+from .utils.engine import Game
+from .utils.policy_io import NO_ACTION, PolicyTable
+from .utils.statespace import (
+    INVERSES,
+    PERMUTATIONS,
+    canonical_states,
+    symmetry_tables,
+)
+import numpy as np
+from os.path import exists
+
+EXACT, LOWER, UPPER = 0, 1, 2
+# Centre first, then corners, then edges.
+MOVE_ORDER = [4, 0, 2, 6, 8, 1, 3, 5, 7]
+
+
+class TranspositionTable:
+    # Search results keyed by the canonical (symmetry-reduced) board: the
+    # negamax value from the mover's point of view, whether it is exact or a
+    # bound, and the best move in the canonical board's frame.
+    def __init__(self, values=None, flags=None, moves=None):
+        self.values = np.zeros(NUM_STATES, dtype=np.int8) if values is None else values
+        self.flags = np.full(NUM_STATES, -1, dtype=np.int8) if flags is None else flags
+        self.moves = (
+            np.full(NUM_STATES, NO_ACTION, dtype=np.uint8) if moves is None else moves
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as table:
+            return cls(table['values'], table['flags'], table['moves'])
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez(f, values=self.values, flags=self.flags, moves=self.moves)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.flags >= 0))
+
+
+class Minimax(TicTacToe):
+    TABLE_PATH = 'models/policies/minimax_table.npz'
+
+    def __init__(self):
+        super().__init__()
+        self.rows = None
+        self.canonical_codes = None
+        if exists(self.TABLE_PATH):
+            self.load_table()
+        else:
+            self.table = TranspositionTable()
+            self.solve()
+            self.save_table()
+        # The exact moves as a policy, for best_actions.
+        self.policy = PolicyTable(self.actions())
+
+    def prepare_search(self):
+        # Plain lists: the search touches single entries, where list
+        # indexing is much cheaper than NumPy scalar access. Only built when
+        # the table cannot answer on its own. Moves and wins are handled by
+        # the in-place Game engine.
+        if self.canonical_codes is not None:
+            return
+        codes, transforms = symmetry_tables()
+        self.canonical_codes = codes.tolist()
+        self.transforms = transforms.tolist()
+        self.permutations = PERMUTATIONS.tolist()
+        self.inverses = INVERSES.tolist()
+        self.game = Game()
+
+    def load_table(self):
+        self.table = TranspositionTable.load(self.TABLE_PATH)
+
+    def save_table(self):
+        self.table.save(self.TABLE_PATH)
+
+    def search_lists(self):
+        # The table as lists while searching, written back afterwards.
+        self.prepare_search()
+        self.rows = (
+            self.table.values.tolist(),
+            self.table.flags.tolist(),
+            self.table.moves.tolist(),
+        )
+
+    def store_lists(self):
+        values, flags, moves = self.rows
+        self.table = TranspositionTable(
+            np.array(values, dtype=np.int8),
+            np.array(flags, dtype=np.int8),
+            np.array(moves, dtype=np.uint8),
+        )
+        self.rows = None
+
+    def negamax(self, game, alpha, beta):
+        if game.winner:
+            # The previous mover has won; quicker wins score higher.
+            return -1 - game.cells.count(0)
+        if 0 not in game.cells:
+            return 0
+
+        values, flags, moves = self.rows
+        code = game.code
+        key = self.canonical_codes[code]
+        transform = self.transforms[code]
+        alpha_start = alpha
+        first = None
+        if flags[key] >= 0:
+            value, flag = values[key], flags[key]
+            if flag == EXACT:
+                return value
+            if flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+            first = self.permutations[transform][moves[key]]
+
+        # Move ordering: the table's best move, then immediate wins, then
+        # centre, corners and edges.
+        candidates = game.legal_moves(MOVE_ORDER)
+        wins = [cell for cell in candidates if game.wins_with(cell)]
+        if wins:
+            ordered = wins[:1]
+        else:
+            ordered = candidates
+            if first is not None:
+                ordered = [first] + [cell for cell in candidates if cell != first]
+
+        best, best_move = -NUM_CELLS - 2, ordered[0]
+        for cell in ordered:
+            game.make_move(cell)
+            value = -self.negamax(game, -beta, -alpha)
+            game.unmake_move()
+            if value > best:
+                best, best_move = value, cell
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    break
+
+        if best <= alpha_start:
+            flags[key] = UPPER
+        elif best >= beta:
+            flags[key] = LOWER
+        else:
+            flags[key] = EXACT
+        values[key] = best
+        moves[key] = self.inverses[transform][best_move]
+        return best
+
+    def search(self, code):
+        # Exact value of `code` for the player to move and the best move,
+        # as a cell index in the board's own frame.
+        batch = self.rows is None
+        if batch:
+            self.search_lists()
+        try:
+            value = self.negamax(
+                self.game.reset(board_cells(code)), -NUM_CELLS - 2, NUM_CELLS + 2
+            )
+            key = self.canonical_codes[code]
+            move = self.permutations[self.transforms[code]][self.rows[2][key]]
+        finally:
+            if batch:
+                self.store_lists()
+        return value, move
+
+    def solve(self, codes=None):
+        # Full-window searches of every reachable position (or of `codes`)
+        # in one pass, so the table answers all of them exactly.
+        if codes is None:
+            codes = canonical_states()
+        self.search_lists()
+        try:
+            for code in codes.tolist():
+                game = self.game.reset(board_cells(code))
+                if not game.terminal():
+                    self.negamax(game, -NUM_CELLS - 2, NUM_CELLS + 2)
+        finally:
+            self.store_lists()
+
+    def value(self, board):
+        return self.search(encode(board))[0]
+
+    def actions(self):
+        # The table's exact moves for every board, in each board's own frame,
+        # as a uint8 array indexed by encoded state (NO_ACTION elsewhere).
+        codes, transforms = symmetry_tables()
+        moves = self.table.moves[codes]
+        known = (self.table.flags[codes] == EXACT) & (moves != NO_ACTION)
+        mapped = PERMUTATIONS[transforms, np.where(known, moves, 0)]
+        return np.where(known, mapped, NO_ACTION).astype(np.uint8)
+
+    def best_action(self):
+        # Answered straight from the table when it holds an exact entry for
+        # this position; only unseen positions trigger a search.
+        cells = np.asarray(self.board, dtype=np.int64).ravel()
+        images = cells[PERMUTATIONS] @ POW3
+        transform = int(images.argmin())
+        key = int(images[transform])
+        if self.table.flags[key] == EXACT and self.table.moves[key] != NO_ACTION:
+            return index_action(int(PERMUTATIONS[transform][self.table.moves[key]]))
+
+        self.prepare_search()
+        if self.game.reset(cells.tolist()).terminal():
+            return None
+        _, move = self.search(int(cells @ POW3))
+        return index_action(move)
+
+
+def board_cells(code):
+    return [code // 3**cell % 3 for cell in range(NUM_CELLS)]
@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import json
+from .utils.encoding import index_action
+from .utils.inference import PolicyEngine
+
+# Line-delimited JSON over TCP. Each request is one JSON object per line:
+#   {"id": 7, "agent": "mdp", "board": [[0, 1, 0], [0, 2, 0], [0, 0, 0]]}
+#   {"id": 8, "agent": "td", "boards": [[...], ...]}
+# and gets one line back with the same id and either "action" / "actions"
+# ([row, col] or null) or "error" (with the id whenever the request parsed).
+# Engines are loaded once and shared by all connections; a lookup is a few
+# microseconds, so requests are answered inline on the event loop.
+DEFAULT_PORT = 8765
+# Longest request line accepted, about 28,000 boards; longer lines get an
+# error reply.
+LINE_LIMIT = 1 << 20
+TOO_LONG = object()
+
+
+def policy_paths():
+    from .linear_td import LinearTemporalDifference
+    from .mc import MonteCarlo
+    from .mdp import MDP
+    from .td import TemporalDifference
+
+    return {
+        'mdp': MDP.POLICY_FILE,
+        'mc': MonteCarlo.POLICY_PATH,
+        'td': TemporalDifference.POLICY_PATH,
+        'linear_td': LinearTemporalDifference.POLICY_PATH,
+    }
+
+
+def load_engines(agents=None, cache_size=4096):
+    paths = policy_paths()
+    return {
+        agent: PolicyEngine.load(paths[agent], cache_size=cache_size)
+        for agent in (agents or paths)
+    }
+
+
+def move(action):
+    return None if action is None else list(action)
+
+
+def answer(engines, request):
+    engine = engines.get(request.get('agent', 'mdp'))
+    if engine is None:
+        raise ValueError(f"unknown agent {request.get('agent')!r}")
+    response = {'id': request.get('id')}
+    if 'boards' in request:
+        response['actions'] = [move(m) for m in engine.moves(request['boards'])]
+    else:
+        action = engine.action(request['board'])
+        response['action'] = move(index_action(action) if action >= 0 else None)
+    return response
+
+
+async def read_line(reader):
+    # The next request line, b'' at the end of the stream, or TOO_LONG for a
+    # line over the reader's limit, which is skipped to its newline.
+    try:
+        return await reader.readuntil(b'\n')
+    except asyncio.IncompleteReadError as error:
+        return error.partial
+    except asyncio.LimitOverrunError as error:
+        consumed = error.consumed
+    while True:
+        await reader.readexactly(consumed)
+        try:
+            await reader.readuntil(b'\n')
+            return TOO_LONG
+        except asyncio.IncompleteReadError:
+            return TOO_LONG
+        except asyncio.LimitOverrunError as error:
+            consumed = error.consumed
+
+
+async def handle(engines, reader, writer):
+    try:
+        while True:
+            request = None
+            line = await read_line(reader)
+            if not line:
+                break
+            try:
+                if line is TOO_LONG:
+                    raise ValueError(f"request line longer than {LINE_LIMIT} bytes")
+                request = json.loads(line)
+                response = answer(engines, request)
+            except (ValueError, KeyError, TypeError, AttributeError) as error:
+                response = {'error': str(error)}
+            if isinstance(request, dict) and 'id' not in response:
+                response = {'id': request.get('id'), **response}
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+    except ConnectionError:
+        pass
+    except asyncio.CancelledError:
+        # Cancelled at server shutdown: close the connection and end
+        # normally, as asyncio's stream callback reports a handler that ends
+        # cancelled as an unhandled exception.
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+
+async def start_server(host='127.0.0.1', port=DEFAULT_PORT, engines=None):
+    if engines is None:
+        engines = load_engines()
+    return await asyncio.start_server(
+        lambda reader, writer: handle(engines, reader, writer),
+        host,
+        port,
+        limit=LINE_LIMIT,
+    )
+
+
+async def serve(host='127.0.0.1', port=DEFAULT_PORT, agents=None, cache_size=4096):
+    server = await start_server(host, port, load_engines(agents, cache_size))
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve policy move queries.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--agents', nargs='+', choices=['mdp', 'mc', 'td', 'linear_td'])
+    parser.add_argument('--cache-size', type=int, default=4096)
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args.host, args.port, args.agents, args.cache_size))
+
+
+if __name__ == '__main__':
+    main()
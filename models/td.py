@@ -1,154 +1,608 @@
-from tqdm import tqdm
 from .utils import TicTacToe
+from .utils.background import BackgroundTraining
+from .utils.checkpoint import (
+    read_checkpoint,
+    restore_seeds,
+    seed_state,
+    write_checkpoint,
+)
+from .utils.encoding import NUM_CELLS, NUM_STATES, action_index, empty_cells, encode
+from .utils.episodes import EpisodeReader
+from .utils.grid import Board, GridGame, GridSimulator
+from .utils.metrics import NULL_METRICS
+from .utils.policy_io import PolicyTable, merge_actions
+from .utils.qtable import QTable
+from .utils.random_stream import RandomStream
+from .utils.simulator import BatchSimulator
+from .utils.sparse_qtable import SparseQTable
+from .utils.statespace import (
+    canonical_action,
+    canonical_states,
+    reachable_states,
+    state_key,
+)
+from .utils.tables import lookup_tables
 import random
 import numpy as np
-import pickle
 from os.path import exists
 
 
-class TemporalDifference(TicTacToe):
-    OPPONENT_POLICY_PATH = 'models/policies/mdp_policy.pkl'
-    POLICY_PATH = 'models/policies/td_policy.pkl'
+class TemporalDifference(GridGame, TicTacToe):
+    OPPONENT_POLICY_PATH = 'models/policies/mdp_policy.policy'
+    POLICY_PATH = 'models/policies/td_policy.policy'
+    # Rows per player of the sparse Q store on boards other than 3x3.
+    Q_CAPACITY = 200_000
 
-    def __init__(self, epsilon=0.2, alpha=0.1, gamma=0.9):
+    def __init__(
+        self,
+        epsilon=0.2,
+        alpha=0.1,
+        gamma=0.9,
+        symmetry=False,
+        size=3,
+        k=None,
+        q_capacity=None,
+        seed=None,
+        background=False,
+        pretrained=True,
+    ):
+        # Boards other than 3x3 work as in MonteCarlo: a random opponent, a
+        # SparseQTable of q_capacity rows and no policy file. background and
+        # pretrained as in MonteCarlo.
         super().__init__()
         self.epsilon = epsilon
+        self.symmetry = symmetry
         self.alpha = alpha
         self.gamma = gamma
+        self.size = size
+        self.k = size if k is None else k
+        self.grid = None if (size, self.k) == (3, 3) else Board(size, self.k)
+        self.q_capacity = q_capacity
+        self.seed = seed
+        if self.grid is not None and symmetry:
+            raise ValueError("symmetry is only available on the 3x3 board")
         self.target_policy = {}
         self.behavior_policy = self.epsilon_greedy_policy
-        self.opponent_policy = self.load_opponent_policy()
-        self.Q = {self.PLAYER_X: {}, self.PLAYER_O: {}}
+        self.opponent_policy = None if self.grid else self.load_opponent_policy()
+        self.simulator = None
+        self.Q = None
+        self.policy = None
         self.current_player = self.PLAYER_X
 
-        if exists(self.POLICY_PATH):
+        if self.grid is not None:
+            self.board = np.zeros((size, size))
+        elif not pretrained:
+            pass
+        elif exists(self.POLICY_PATH):
             self.load_policy()
+        elif background:
+            self.training = BackgroundTraining(self)
         else:
             self.train()
             self.save_policy()
 
     def load_opponent_policy(self):
-        with open(self.OPPONENT_POLICY_PATH, 'rb') as f:
-            return pickle.load(f)
+        return PolicyTable.load(self.OPPONENT_POLICY_PATH)
 
     def opponent_move(self, game):
-        state = tuple(map(tuple, game.board))
-        if state in self.opponent_policy:
-            return self.opponent_policy[state]
+        action = self.opponent_policy.action(encode(game.board))
+        if action is not None:
+            return action
         else:
-            return random.choice(self.possible_actions(state))
+            return random.choice(self.possible_actions(game.board))
 
     def load_policy(self):
-        with open(self.POLICY_PATH, 'rb') as f:
-            self.policy = pickle.load(f)
+        self.policy = PolicyTable.load(self.POLICY_PATH)
 
     def save_policy(self):
-        with open(self.POLICY_PATH, 'wb') as f:
-            pickle.dump(self.policy, f)
+        self.policy.save(self.POLICY_PATH)
 
     def epsilon_greedy_policy(self, state, Q):
-        possible_acts = self.possible_actions(state)
+        # Works on any Q store; with symmetry the values are read from the
+        # canonical board and the moves stay in the frame of `state`.
+        code, transform = state_key(state, self.symmetry)
+        if isinstance(Q, QTable) and Q.index[code] < 0:
+            raise ValueError(f"state {state} has no row in the Q table")
+        possible_acts = empty_cells(state)
         num_actions = len(possible_acts)
         probs = [self.epsilon / num_actions for _ in range(num_actions)]
 
-        if state in Q:
-            q_values = [Q[state].get(action, 0) for action in possible_acts]
-            if sum(q_values) != 0:
-                max_val = max(q_values)
-                best_actions = [idx for idx, q in enumerate(q_values) if q == max_val]
-                for idx in best_actions:
-                    probs[idx] += (1.0 - self.epsilon) / len(best_actions)
-
-        total = sum(probs)
-        probs = [p / total for p in probs]
+        q_values = Q.get(
+            np.full(num_actions, code),
+            [action_index(canonical_action(a, transform)) for a in possible_acts],
+        ).tolist()
+        max_val = max(q_values)
+        best_actions = [idx for idx, q in enumerate(q_values) if q == max_val]
+        for idx in best_actions:
+            probs[idx] += (1.0 - self.epsilon) / len(best_actions)
 
         return probs, possible_acts
 
-    def simulate_result(self, game, action):
-        new_game = TicTacToe()
-        new_game.board = np.copy(game.board)
-        new_game.board[action[0]][action[1]] = (
-            self.PLAYER_X if not game.x_is_human else self.PLAYER_O
-        )
-        return new_game
-
     def update_Q(self, state, action, reward, next_state):
-        current_estimate = self.Q[self.current_player].get(state, {}).get(action, 0)
+        # A single update for the current player: encoded boards, an (i, j)
+        # action and next_state None once the game is over.
+        code, transform = state_key(state, self.symmetry)
+        self.update_Q_batch(
+            np.array([code]),
+            np.array([action_index(canonical_action(action, transform))]),
+            np.array([reward], dtype=float),
+            np.array(
+                [-1 if next_state is None else state_key(next_state, self.symmetry)[0]]
+            ),
+        )
 
-        max_next_Q = max(
-            self.Q[self.current_player].get(next_state, {}).values(), default=0
+    def update_Q_batch(self, states, actions, rewards, next_states):
+        q_learning_update(
+            self.Q[self.current_player],
+            states,
+            actions,
+            rewards,
+            next_states,
+            self.alpha,
+            self.gamma,
         )
-        td_target = reward + self.gamma * max_next_Q
 
-        td_error = td_target - current_estimate
+    def learn(self, batch):
+        learn_batch(self.Q[self.current_player], batch, self.alpha, self.gamma)
 
-        if state not in self.Q[self.current_player]:
-            self.Q[self.current_player][state] = {}
+    def prepare_training(self):
+        # Simulation tables and the learner state are only built once
+        # training is actually needed.
+        if self.simulator is None:
+            if self.grid is not None:
+                self.simulator = GridSimulator(self.grid, rng=RandomStream(self.seed))
+            else:
+                self.simulator = BatchSimulator(
+                    self.opponent_policy, self.symmetry, RandomStream(self.seed)
+                )
+        if self.Q is None:
+            self.reset_training()
 
-        self.Q[self.current_player][state][action] = (
-            current_estimate + self.alpha * td_error
-        )
+    def new_qtable(self):
+        if self.grid is not None:
+            return SparseQTable(
+                self.grid.num_cells, self.q_capacity or self.Q_CAPACITY, self.grid.legal
+            )
+        if self.q_capacity is not None:
+            return SparseQTable(
+                NUM_CELLS,
+                self.q_capacity,
+                lookup_tables().empty.__getitem__,
+                num_states=NUM_STATES,
+            )
+        return QTable(canonical_states() if self.symmetry else reachable_states())
+
+    def reset_training(self):
+        self.Q = {self.PLAYER_X: self.new_qtable(), self.PLAYER_O: self.new_qtable()}
+        self.episodes_done = {self.PLAYER_X: 0, self.PLAYER_O: 0}
+        self.seeds = np.random.SeedSequence(self.seed)
+
+    def save_checkpoint(self, path):
+        arrays = {}
+        for player in [self.PLAYER_X, self.PLAYER_O]:
+            Q = self.Q[player]
+            arrays[f'values_{player}'] = Q.values
+            arrays[f'visited_{player}'] = Q.visited
+            if isinstance(Q, SparseQTable):
+                arrays[f'states_{player}'] = Q.states
+                arrays[f'counts_{player}'] = Q.counts
+        meta = {
+            'algorithm': 'td',
+            'symmetry': self.symmetry,
+            'board': [self.size, self.k],
+            'epsilon': self.epsilon,
+            'alpha': self.alpha,
+            'gamma': self.gamma,
+            'episodes': {str(p): n for p, n in self.episodes_done.items()},
+            'rng': self.simulator.rng.state,
+            'seeds': seed_state(self.seeds),
+        }
+        write_checkpoint(path, arrays, meta)
+        self.checkpointed = sum(self.episodes_done.values())
+
+    def load_checkpoint(self, path):
+        self.prepare_training()
+        arrays, meta = read_checkpoint(path)
+        if (
+            meta['algorithm'] != 'td'
+            or meta['symmetry'] != self.symmetry
+            or meta.get('board', [3, 3]) != [self.size, self.k]
+        ):
+            raise ValueError(f"{path} is not a checkpoint for this learner")
+        for player in [self.PLAYER_X, self.PLAYER_O]:
+            self.Q[player].restore(
+                arrays[f'values_{player}'],
+                arrays[f'visited_{player}'],
+                arrays.get(f'states_{player}'),
+                arrays.get(f'counts_{player}'),
+            )
+        self.epsilon = meta['epsilon']
+        self.episodes_done = {int(p): n for p, n in meta['episodes'].items()}
+        self.simulator.rng.state = meta['rng']
+        self.seeds = restore_seeds(meta['seeds'])
+        self.checkpointed = sum(self.episodes_done.values())
+
+    def checkpoint(self, path, every):
+        if path is not None and (
+            sum(self.episodes_done.values()) - self.checkpointed >= every
+        ):
+            self.save_checkpoint(path)
+
+    def training_stats(self, player=None):
+        return {
+            'player': player,
+            'episodes': sum(self.episodes_done.values()),
+            'epsilon': float(self.epsilon),
+            'q_entries': int(sum(Q.visited.sum() for Q in self.Q.values())),
+            'q_states': int(sum(Q.visited.any(axis=1).sum() for Q in self.Q.values())),
+            'q_bytes': sum(Q.nbytes for Q in self.Q.values()),
+        }
 
     def generate_episode(self):
-        current_game = TicTacToe()
-        while not current_game.terminal(current_game.board):
-            state = tuple(map(tuple, current_game.board))
-            current_player = (
-                self.PLAYER_X
-                if (sum(sum(current_game.board)) % 2 == 0)
-                else self.PLAYER_O
+        self.prepare_training()
+        self.learn(
+            self.simulator.run(
+                self.Q[self.current_player], self.current_player, 1, self.epsilon
             )
+        )
 
-            if current_player == self.current_player:
-                action_probs, possible_acts = self.epsilon_greedy_policy(
-                    state, self.Q[current_player]
-                )
-                chosen_index = np.random.choice(len(possible_acts), p=action_probs)
-                action = possible_acts[chosen_index]
-            else:
-                action = self.opponent_move(current_game)
-
-            next_game = self.simulate_result(current_game, action)
-
-            if next_game.terminal(next_game.board):
-                winner = next_game.winner(next_game.board)
-                if winner == self.PLAYER_X:
-                    reward = 1 if self.current_player == self.PLAYER_X else -1
-                elif winner == self.PLAYER_O:
-                    reward = -1 if self.current_player == self.PLAYER_O else 1
-                else:
-                    reward = 0
-            else:
-                reward = 0
+    def train(
+        self,
+        num_episodes=1_00_000,
+        split_ratio=0.5,
+        batch_size=100,
+        workers=1,
+        epsilons=None,
+        seed=None,
+        snapshot_every=5.0,
+        checkpoint_path=None,
+        checkpoint_every=10_000,
+        resume=False,
+        extend=False,
+        metrics=None,
+        early_stopping=None,
+    ):
+        # resume picks up the checkpoint at checkpoint_path, if there is one,
+        # and trains until num_episodes have been played in total. extend
+        # keeps the current Q and plays num_episodes more on top. With an
+        # EarlyStopping, each seat stops as soon as it has settled.
+        from tqdm import tqdm
 
-            next_state = tuple(map(tuple, next_game.board))
-            self.update_Q(state, action, reward, next_state)
-            current_game = next_game
+        if metrics is None:
+            metrics = NULL_METRICS
+        self.prepare_training()
+        self.simulator.metrics = metrics
+        if resume and checkpoint_path is not None and exists(checkpoint_path):
+            self.load_checkpoint(checkpoint_path)
+        else:
+            if not extend:
+                self.reset_training()
+            if seed is not None:
+                self.simulator.rng = RandomStream(seed)
+                self.seeds = np.random.SeedSequence(seed)
+        self.checkpointed = sum(self.episodes_done.values())
+        if workers > 1 and not isinstance(self.Q[self.PLAYER_X], QTable):
+            raise ValueError("parallel training needs the dense Q table")
 
-    def train(self, num_episodes=1_00_000, split_ratio=0.5):
         x_episodes = int(split_ratio * num_episodes)
         o_episodes = num_episodes - x_episodes
+        episodes = {self.PLAYER_X: x_episodes, self.PLAYER_O: o_episodes}
+        if extend:
+            for player in episodes:
+                episodes[player] += self.episodes_done[player]
+
+        if workers > 1 and early_stopping is not None:
+            raise ValueError("early stopping needs workers=1")
+        if workers > 1:
+            self.train_parallel(
+                episodes,
+                batch_size,
+                workers,
+                epsilons,
+                snapshot_every,
+                checkpoint_path,
+                checkpoint_every,
+                metrics,
+            )
+        else:
+            for player in [self.PLAYER_X, self.PLAYER_O]:
+                self.current_player = player
+                if early_stopping is not None:
+                    early_stopping.start(self, player)
+                with tqdm(
+                    total=episodes[player], initial=self.episodes_done[player]
+                ) as progress:
+                    while self.episodes_done[player] < episodes[player]:
+                        with metrics.phase('simulation'):
+                            batch = self.simulator.run(
+                                self.Q[player],
+                                player,
+                                min(
+                                    batch_size,
+                                    episodes[player] - self.episodes_done[player],
+                                ),
+                                self.epsilon,
+                            )
+                        with metrics.phase('update'):
+                            self.learn(batch)
+                            self.Q[player].maintain()
+                        self.episodes_done[player] += len(batch)
+                        progress.update(len(batch))
+                        metrics.episodes(
+                            len(batch),
+                            batch.rewards.sum(),
+                            lambda: self.training_stats(player),
+                        )
+                        self.checkpoint(checkpoint_path, checkpoint_every)
+                        if early_stopping is not None and early_stopping.check(
+                            self, player, metrics
+                        ):
+                            break
+
+        metrics.flush(self.training_stats)
+        if checkpoint_path is not None:
+            self.save_checkpoint(checkpoint_path)
+        if self.grid is None:
+            self.policy = self.extract_policy()
 
-        for player, episodes in [
-            (self.PLAYER_X, x_episodes),
-            (self.PLAYER_O, o_episodes),
-        ]:
+    def train_offline(self, directories, batch_size=100, metrics=None):
+        # Replays episode logs written by record_episodes through the
+        # Q-learning update, one batch in memory at a time. Continues from
+        # the current Q.
+        if metrics is None:
+            metrics = NULL_METRICS
+        if isinstance(directories, str):
+            directories = [directories]
+        self.prepare_training()
+        readers = [EpisodeReader(directory) for directory in directories]
+        for reader in readers:
+            reader.check(self)
+
+        for player in [self.PLAYER_X, self.PLAYER_O]:
             self.current_player = player
-            for _ in tqdm(range(episodes)):
-                self.generate_episode()
+            for reader in readers:
+                for batch in reader.batches(player, batch_size):
+                    with metrics.phase('update'):
+                        self.learn(batch)
+                        self.Q[player].maintain()
+                    self.episodes_done[player] += len(batch)
+                    metrics.episodes(
+                        len(batch),
+                        batch.rewards.sum(),
+                        lambda: self.training_stats(player),
+                    )
+
+        metrics.flush(self.training_stats)
+        if self.grid is None:
+            self.policy = self.extract_policy()
+
+    def extract_policy(self):
+        return PolicyTable(
+            merge_actions(
+                self.Q[self.PLAYER_X].policy(), self.Q[self.PLAYER_O].policy()
+            ),
+            'td',
+            self.symmetry,
+        )
+
+    def train_parallel(
+        self,
+        episodes,
+        batch_size,
+        workers,
+        epsilons,
+        snapshot_every,
+        checkpoint_path,
+        checkpoint_every,
+        metrics,
+    ):
+        # Hogwild-style: every worker reads and writes the same Q arrays in
+        # shared memory without locks. The main process only watches progress
+        # and periodically refreshes self.policy from a snapshot of Q; any
+        # checkpoint it writes in between is just as unsynchronised. Workers
+        # only count episodes, so progress records carry no returns or phase
+        # split.
+        from concurrent.futures import ProcessPoolExecutor, wait
+        from tqdm import tqdm
+        from .utils.shared import SharedArray
+
+        if epsilons is None:
+            epsilons = [self.epsilon] * workers
+        seeds = self.seeds.spawn(workers)
+        remaining = {
+            player: max(0, total - self.episodes_done[player])
+            for player, total in episodes.items()
+        }
+        start = dict(self.episodes_done)
 
-        self.policy = {}
+        shared = {}
         for player in [self.PLAYER_X, self.PLAYER_O]:
-            self.policy.update(
-                {
-                    state: max(self.Q[player][state], key=self.Q[player][state].get)
-                    for state in self.Q[player]
-                }
+            Q = self.Q[player]
+            shared[player] = (
+                SharedArray(Q.values.shape, Q.values.dtype),
+                SharedArray(Q.visited.shape, Q.visited.dtype),
             )
+            shared[player][0].array[:] = Q.values
+            shared[player][1].array[:] = Q.visited
+        # Episodes played per worker, with a column per player.
+        counter = SharedArray((workers, 3), np.int64)
+
+        try:
+            for player, (values, visited) in shared.items():
+                self.Q[player] = QTable(
+                    self.Q[player].states, values=values.array, visited=visited.array
+                )
+            specs = {
+                player: (values.spec(), visited.spec())
+                for player, (values, visited) in shared.items()
+            }
+
+            with ProcessPoolExecutor(max_workers=workers) as pool, tqdm(
+                total=sum(episodes.values()), initial=sum(start.values())
+            ) as progress:
+                futures = []
+                for worker in range(workers):
+                    shares = {
+                        player: total // workers + (worker < total % workers)
+                        for player, total in remaining.items()
+                    }
+                    futures.append(
+                        pool.submit(
+                            run_worker,
+                            worker,
+                            specs,
+                            counter.spec(),
+                            self.Q[self.PLAYER_X].states,
+                            self.simulator.opponent,
+                            self.symmetry,
+                            shares,
+                            epsilons[worker],
+                            self.alpha,
+                            self.gamma,
+                            batch_size,
+                            seeds[worker],
+                        )
+                    )
+
+                pending = futures
+                while pending:
+                    _, pending = wait(pending, timeout=snapshot_every)
+                    for player in start:
+                        self.episodes_done[player] = start[player] + int(
+                            counter.array[:, player].sum()
+                        )
+                    played = sum(self.episodes_done.values()) - progress.n
+                    progress.update(played)
+                    metrics.episodes(played, None, self.training_stats)
+                    self.policy = self.extract_policy()
+                    if pending:
+                        self.checkpoint(checkpoint_path, checkpoint_every)
+                for future in futures:
+                    future.result()
+        finally:
+            for player, (values, visited) in shared.items():
+                Q = self.Q[player]
+                self.Q[player] = QTable(Q.states)
+                self.Q[player].values[:] = values.array
+                self.Q[player].visited[:] = visited.array
+                values.unlink()
+                visited.unlink()
+            counter.unlink()
 
     def best_action(self):
-        state = tuple(map(tuple, self.board))
-        if state in self.policy:
-            return self.policy[state]
+        if self.grid is not None:
+            return self.grid_action()
+        action = self.policy.action(encode(self.board))
+        if action is not None:
+            return action
         else:
-            return random.choice(self.possible_actions(state))
+            return random.choice(self.possible_actions(self.board))
+
+
+def q_learning_update(Q, states, actions, rewards, next_states, alpha, gamma):
+    # next_states is the learner's next decision state, or -1 once the game
+    # is over. A (state, action) pair can occur several times in one call
+    # (every X game starts from the empty board), and all of its updates are
+    # applied, in order. In learn_batch's calls next states always hold more
+    # pieces than states, so no target depends on a value updated in the same
+    # call. Then n updates q <- q + alpha * (t_i - q) of one pair add up to
+    # (1 - alpha)^n * q + sum_i alpha * (1 - alpha)^(n - i) * t_i, and that
+    # is what gets written: the result of one-at-a-time Q-learning, up to
+    # rounding, with a single read and write per distinct pair.
+    states, actions = np.asarray(states), np.asarray(actions)
+    td_target = rewards + gamma * Q.max_values(next_states)
+
+    # A stable sort puts repeats of a pair next to each other in their
+    # original order.
+    order = np.lexsort((actions, states))
+    states, actions = states[order], actions[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (states[1:] != states[:-1]) | (actions[1:] != actions[:-1])
+    pair = np.cumsum(first) - 1
+    starts = np.flatnonzero(first)
+    counts = np.diff(starts, append=len(order))
+    later = counts[pair] - 1 - (np.arange(len(order)) - starts[pair])
+    pulled = np.bincount(
+        pair,
+        alpha * (1 - alpha) ** later * np.asarray(td_target)[order],
+        minlength=len(starts),
+    )
+
+    current_estimate = Q.get(states[starts], actions[starts])
+    Q.set(
+        states[starts],
+        actions[starts],
+        (1 - alpha) ** counts * current_estimate + pulled,
+    )
+
+
+def learn_batch(Q, batch, alpha, gamma):
+    last_step = batch.states.shape[1] - 1
+    for t in range(last_step + 1):
+        games = np.flatnonzero(t < batch.lengths)
+        next_states = np.where(
+            t + 1 < batch.lengths[games],
+            batch.states[games, min(t + 1, last_step)],
+            -1,
+        )
+        q_learning_update(
+            Q,
+            batch.states[games, t],
+            batch.actions[games, t],
+            batch.rewards[games, t],
+            next_states,
+            alpha,
+            gamma,
+        )
+
+
+def epsilon_schedule(epsilon, progress):
+    # A worker's epsilon is either a constant or a (start, end) pair annealed
+    # linearly over that worker's episodes.
+    if isinstance(epsilon, (tuple, list)):
+        start, end = epsilon
+        return start + (end - start) * progress
+    return epsilon
+
+
+def run_worker(
+    worker,
+    specs,
+    counter_spec,
+    states,
+    opponent,
+    symmetry,
+    episodes,
+    epsilon,
+    alpha,
+    gamma,
+    batch_size,
+    seed,
+):
+    from .utils.shared import SharedArray
+
+    arrays = []
+    try:
+        counter = SharedArray.attach(counter_spec)
+        arrays.append(counter)
+        simulator = BatchSimulator(opponent, symmetry, RandomStream(seed))
+        total = sum(episodes.values())
+        done = 0
+        for player, player_episodes in episodes.items():
+            values = SharedArray.attach(specs[player][0])
+            visited = SharedArray.attach(specs[player][1])
+            arrays += [values, visited]
+            Q = QTable(states, values=values.array, visited=visited.array)
+            for start in range(0, player_episodes, batch_size):
+                batch = simulator.run(
+                    Q,
+                    player,
+                    min(batch_size, player_episodes - start),
+                    epsilon_schedule(epsilon, done / total),
+                )
+                learn_batch(Q, batch, alpha, gamma)
+                done += len(batch)
+                counter.array[worker, player] += len(batch)
+    finally:
+        for array in arrays:
+            array.close()
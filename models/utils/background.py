@@ -0,0 +1,67 @@
+import inspect
+import threading
+import time
+from .policy_io import PolicyTable
+from .solver import solver
+
+FALLBACKS = ['solver', 'mdp']
+
+
+class BackgroundTraining:
+    # Runs learner.train() on a daemon thread so the learner can play at
+    # once. Until training finishes the learner plays from `fallback`: the
+    # exact solver or the MDP policy it also trains against. train() ends by
+    # assigning the learned policy to learner.policy in one step, so every
+    # move is looked up in one complete policy, old or new; the policy file
+    # is then written for the next start. train_kwargs go to train().
+    def __init__(self, learner, fallback='solver', **train_kwargs):
+        if fallback not in FALLBACKS:
+            raise ValueError(f"fallback must be one of {FALLBACKS}")
+        self.learner = learner
+        self.fallback = fallback
+        self.train_kwargs = train_kwargs
+        self.total = train_kwargs.get(
+            'num_episodes',
+            inspect.signature(learner.train).parameters['num_episodes'].default,
+        )
+        self.error = None
+        self.seconds = None
+        if fallback == 'solver':
+            learner.policy = PolicyTable(solver().policy())
+        else:
+            learner.policy = learner.opponent_policy
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            self.learner.train(**self.train_kwargs)
+            self.learner.save_policy()
+        except Exception as error:
+            self.error = error
+        finally:
+            self.seconds = time.perf_counter() - self.started
+
+    def running(self):
+        return self.thread.is_alive()
+
+    def wait(self, timeout=None):
+        self.thread.join(timeout)
+        return not self.running()
+
+    def episodes(self):
+        episodes_done = getattr(self.learner, 'episodes_done', None)
+        return sum(episodes_done.values()) if episodes_done else 0
+
+    def status(self):
+        if self.running():
+            done = min(self.episodes(), self.total)
+            return (
+                f"Training: {done:,} / {self.total:,} episodes "
+                f"({100 * done // max(self.total, 1)}%), "
+                f"playing {self.fallback} moves meanwhile"
+            )
+        if self.error is not None:
+            return f"Training failed ({self.error}), playing {self.fallback} moves"
+        return f"Trained in {self.seconds:.0f}s, playing the learned policy"
@@ -0,0 +1,43 @@
+import json
+import os
+import tempfile
+import numpy as np
+
+# A checkpoint is an uncompressed .npz archive: the learner's arrays stored
+# as-is plus a JSON document ('meta') with the scalars, episode counters and
+# RNG state. It is written to a temporary file next to the target and moved
+# into place, so a crash mid-write never leaves a truncated checkpoint.
+META_KEY = 'meta'
+
+
+def write_checkpoint(path, arrays, meta):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays, **{META_KEY: np.array(json.dumps(meta))})
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+
+
+def read_checkpoint(path):
+    with np.load(path) as archive:
+        meta = json.loads(str(archive[META_KEY]))
+        arrays = {name: archive[name] for name in archive.files if name != META_KEY}
+    return arrays, meta
+
+
+def seed_state(seeds):
+    # Enough to rebuild a SeedSequence that carries on spawning where the
+    # saved one stopped.
+    return {'entropy': seeds.entropy, 'spawned': seeds.n_children_spawned}
+
+
+def restore_seeds(state):
+    return np.random.SeedSequence(state['entropy'], n_children_spawned=state['spawned'])
@@ -0,0 +1,123 @@
+import numpy as np
+from .encoding import NUM_CELLS
+from .policy_io import PolicyTable
+from .statespace import canonical_states, reachable_states
+from .tables import lookup_tables
+
+
+class EarlyStopping:
+    # Decides when training of one seat has settled. Every `every` episodes
+    # of that seat it compares the learner's Q values on every board where
+    # the seat is to move with those of the previous check:
+    # - churn: the share of boards with any nonzero Q value where the
+    #   previous greedy move is now worse than the best one by more than
+    #   `margin` (moves closer than that count as ties);
+    # - q_change: the largest change of a legal Q value;
+    # - with `games`, the win+draw rate of the greedy policy against the MDP
+    #   opponent over that many games, always played from the same seed.
+    # The seat stops once all of them have stayed within tolerance for
+    # `patience` checks in a row; a tolerance of None leaves that figure
+    # out. Every check is kept in `history` and emitted as a 'convergence'
+    # record.
+    def __init__(
+        self,
+        every=10_000,
+        churn=0.01,
+        q_change=0.05,
+        games=0,
+        score_change=0.005,
+        patience=3,
+        margin=1e-3,
+        seed=0,
+    ):
+        self.every = every
+        self.churn = churn
+        self.q_change = q_change
+        self.games = games
+        self.score_change = score_change
+        self.patience = patience
+        self.margin = margin
+        self.seed = seed
+        self.history = []
+        self.stopped = {}
+
+    def start(self, learner, player):
+        if learner.grid is not None:
+            raise ValueError("early stopping is only available on the 3x3 board")
+        tables = lookup_tables()
+        states = canonical_states() if learner.symmetry else reachable_states()
+        self.states = states[
+            (tables.player[states] == player) & ~tables.terminal[states]
+        ]
+        self.legal = tables.empty[self.states]
+        self.previous = self.snapshot(learner, player)
+        self.checked = learner.episodes_done[player]
+        self.settled = 0
+
+    def snapshot(self, learner, player):
+        values = (
+            learner.Q[player]
+            .get(
+                np.repeat(self.states, NUM_CELLS),
+                np.tile(np.arange(NUM_CELLS), len(self.states)),
+            )
+            .reshape(len(self.states), NUM_CELLS)
+        )
+        score = self.score(learner, player) if self.games else None
+        return np.where(self.legal, values, 0), score
+
+    def score(self, learner, player):
+        # Win+draw rate of the greedy policy in its own seat against the MDP
+        # opponent, on the vectorized evaluation engine.
+        from ..evaluation import run_worker
+
+        mine = PolicyTable(
+            learner.Q[player].policy(), symmetry=learner.symmetry
+        ).expanded()
+        opponent = learner.opponent_policy.expanded()
+        seats = (mine, opponent) if player == learner.PLAYER_X else (opponent, mine)
+        winners, _ = run_worker(*seats, self.games, self.games, self.seed)
+        return float(winners[0] + winners[player]) / self.games
+
+    def within(self, value, tolerance):
+        return tolerance is None or value <= tolerance
+
+    def check(self, learner, player, metrics):
+        # True once the seat has settled; cheap between checks.
+        episodes = learner.episodes_done[player]
+        if episodes - self.checked < self.every:
+            return False
+        self.checked = episodes
+        values, score = self.snapshot(learner, player)
+        previous_values, previous_score = self.previous
+        self.previous = values, score
+
+        masked = np.where(self.legal, values, -np.inf)
+        before = np.where(self.legal, previous_values, -np.inf).argmax(axis=1)
+        seen = (values != 0).any(axis=1)
+        changed = seen & (
+            masked[np.arange(len(masked)), before]
+            < masked.max(axis=1, initial=-np.inf) - self.margin
+        )
+        record = {
+            'player': player,
+            'episodes': episodes,
+            'churn': float(changed.sum()) / max(int(seen.sum()), 1),
+            'q_change': float(np.abs(values - previous_values).max(initial=0)),
+            'score': score,
+        }
+        settled = self.within(record['churn'], self.churn) and self.within(
+            record['q_change'], self.q_change
+        )
+        if self.games:
+            settled = settled and self.within(
+                abs(score - previous_score), self.score_change
+            )
+        self.settled = self.settled + 1 if settled else 0
+        record['settled'] = self.settled
+        self.history.append(record)
+        metrics.emit('convergence', **record)
+        if self.settled >= self.patience:
+            self.stopped[player] = episodes
+            return True
+        return False
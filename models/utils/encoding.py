@@ -0,0 +1,62 @@
+import numpy as np
+
+# A board is encoded as a single base-3 integer: cell (i, j) is digit
+# i * 3 + j, with 0 = empty, 1 = X and 2 = O.
+BOARD_SIZE = 3
+NUM_CELLS = BOARD_SIZE * BOARD_SIZE
+NUM_STATES = 3**NUM_CELLS
+
+POW3 = np.array([3**i for i in range(NUM_CELLS)], dtype=np.int64)
+POW3_LIST = [3**i for i in range(NUM_CELLS)]
+ACTIONS = [(i, j) for i in range(BOARD_SIZE) for j in range(BOARD_SIZE)]
+
+
+def action_index(action):
+    return action[0] * BOARD_SIZE + action[1]
+
+
+def index_action(index):
+    return ACTIONS[index]
+
+
+def encode(board):
+    return int(np.asarray(board, dtype=np.int64).reshape(NUM_CELLS) @ POW3)
+
+
+def decode(code):
+    return ((code // POW3) % 3).reshape(BOARD_SIZE, BOARD_SIZE)
+
+
+def encode_move(code, action, player):
+    return code + player * POW3_LIST[action_index(action)]
+
+
+def empty_cells(code):
+    cells = []
+    for index in range(NUM_CELLS):
+        code, digit = divmod(code, 3)
+        if digit == 0:
+            cells.append(ACTIONS[index])
+    return cells
+
+
+def encode_batch(boards):
+    boards = np.asarray(boards, dtype=np.int64).reshape(-1, NUM_CELLS)
+    return boards @ POW3
+
+
+def decode_batch(codes):
+    codes = np.asarray(codes, dtype=np.int64)
+    return ((codes[:, None] // POW3) % 3).astype(np.int8)
+
+
+def all_boards():
+    return decode_batch(np.arange(NUM_STATES))
+
+
+def migrate_keys(table):
+    # Policies pickled before the integer encoding are keyed by tuple-of-tuple
+    # boards; re-key them so old files keep loading.
+    if table and not isinstance(next(iter(table)), (int, np.integer)):
+        return {encode(state): value for state, value in table.items()}
+    return table
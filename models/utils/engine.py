@@ -0,0 +1,88 @@
+from .grid import Board
+
+
+class Game:
+    # One game played in place on a Board's geometry: make_move and
+    # unmake_move update the cells, the base-3 code and bitboard key and a
+    # per-player count of marks on every line, so a win is spotted from the
+    # lines through the last move alone and nothing is allocated per move.
+    # The base-3 code matches encoding.encode on 3x3 boards.
+    def __init__(self, board=None):
+        self.board = Board(3) if board is None else board
+        self.num_cells = self.board.num_cells
+        self.k = self.board.k
+        masks = [int(line) for line in self.board.lines]
+        self.cell_lines = [
+            [line for line, mask in enumerate(masks) if mask >> cell & 1]
+            for cell in range(self.num_cells)
+        ]
+        self.pow3 = [3**cell for cell in range(self.num_cells)]
+        self.bits = [
+            None,
+            [1 << cell for cell in range(self.num_cells)],
+            [1 << (cell + self.num_cells) for cell in range(self.num_cells)],
+        ]
+
+        self.reset()
+
+    def reset(self, cells=None):
+        # Back to the empty board, or to the position `cells` (a flat list
+        # of 0/1/2) set up directly; its pieces cannot be unmade.
+        self.cells = [0] * self.num_cells
+        self.counts = [None, [0] * len(self.board.lines), [0] * len(self.board.lines)]
+        self.history = []
+        self.winner = 0
+        self.code = 0
+        self.key = 0
+        for cell, player in enumerate(cells or []):
+            if player:
+                self.place(cell, int(player))
+        self.player = 1 if self.cells.count(1) == self.cells.count(2) else 2
+        return self
+
+    def place(self, cell, player):
+        self.cells[cell] = player
+        self.code += player * self.pow3[cell]
+        self.key |= self.bits[player][cell]
+        counts = self.counts[player]
+        won = False
+        for line in self.cell_lines[cell]:
+            counts[line] += 1
+            if counts[line] == self.k:
+                won = True
+        if won:
+            self.winner = player
+        return won
+
+    def make_move(self, cell):
+        # Plays `cell` for the player to move; True if it wins.
+        self.history.append((cell, self.winner))
+        won = self.place(cell, self.player)
+        self.player = 3 - self.player
+        return won
+
+    def unmake_move(self):
+        cell, self.winner = self.history.pop()
+        player = 3 - self.player
+        self.player = player
+        self.cells[cell] = 0
+        self.code -= player * self.pow3[cell]
+        self.key &= ~self.bits[player][cell]
+        counts = self.counts[player]
+        for line in self.cell_lines[cell]:
+            counts[line] -= 1
+
+    def terminal(self):
+        return bool(self.winner) or 0 not in self.cells
+
+    def legal_moves(self, order=None):
+        cells = self.cells
+        return [cell for cell in (order or range(self.num_cells)) if not cells[cell]]
+
+    def wins_with(self, cell):
+        # Whether the player to move would complete a line by playing `cell`.
+        ours, theirs = self.counts[self.player], self.counts[3 - self.player]
+        need = self.k - 1
+        return any(
+            ours[line] == need and not theirs[line] for line in self.cell_lines[cell]
+        )
@@ -0,0 +1,228 @@
+import json
+import os
+import tempfile
+import numpy as np
+from .simulator import Trajectories
+
+# An episode log is a directory of shards plus a JSON manifest. A shard holds
+# up to shard_size games of one learner as plain .npy arrays, padded to the
+# longest game like Trajectories: states in the manifest's state dtype
+# (uint16 fits every encoded 3x3 board), actions as uint8, behaviour
+# probabilities as float32, and one int8 outcome and uint8 length per game.
+# Shards are opened memory-mapped, so replaying a log only ever holds one
+# batch in RAM.
+MANIFEST = 'manifest.json'
+FIELDS = ['states', 'actions', 'probs', 'outcomes', 'lengths', 'final_states']
+
+
+def write_json(path, document):
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(document, f, indent=2)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST)) as f:
+        return json.load(f)
+
+
+class EpisodeWriter:
+    # Buffers batches per learner and writes a shard whenever shard_size
+    # games have piled up; close() flushes what is left. `info` is stored in
+    # the manifest for readers to check (board, symmetry, ...).
+    def __init__(self, directory, state_dtype=np.uint16, shard_size=100_000, info=None):
+        self.directory = directory
+        self.state_dtype = np.dtype(state_dtype)
+        self.shard_size = shard_size
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, MANIFEST)
+        # As it reads back from JSON, so tuples compare equal to lists.
+        info = json.loads(json.dumps(info or {}))
+        if os.path.exists(path):
+            self.manifest = read_manifest(directory)
+            if self.manifest['state_dtype'] != self.state_dtype.str:
+                raise ValueError(f"{directory} holds states of another dtype")
+            if self.manifest['info'] != info:
+                raise ValueError(
+                    f"{directory} was logged with {self.manifest['info']}, not {info}"
+                )
+        else:
+            self.manifest = {
+                'state_dtype': self.state_dtype.str,
+                'info': info,
+                'shards': [],
+            }
+        self.buffers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, player, batch):
+        self.buffers.setdefault(player, []).append(batch)
+        while sum(len(b) for b in self.buffers[player]) >= self.shard_size:
+            self.flush(player, self.shard_size)
+
+    def flush(self, player, count=None):
+        buffer = self.buffers.get(player)
+        if not buffer:
+            return
+        merged = concatenate(buffer)
+        count = len(merged) if count is None else count
+        rest = slice_batch(merged, count, len(merged))
+        self.buffers[player] = [rest] if len(rest) else []
+        self.write_shard(player, slice_batch(merged, 0, count))
+
+    def write_shard(self, player, batch):
+        name = f'{player}-{len(self.manifest["shards"]):05d}'
+        # A shard left behind by a crash before its manifest entry was
+        # written is overwritten.
+        os.makedirs(os.path.join(self.directory, name), exist_ok=True)
+        final = batch.rewards[np.arange(len(batch)), np.maximum(batch.lengths - 1, 0)]
+        arrays = {
+            'states': batch.states.astype(self.state_dtype),
+            'actions': batch.actions.astype(np.uint8),
+            'probs': batch.probs.astype(np.float32),
+            'outcomes': final.astype(np.int8),
+            'lengths': batch.lengths.astype(np.uint8),
+            'final_states': batch.final_states.astype(self.state_dtype),
+        }
+        for field, array in arrays.items():
+            np.save(os.path.join(self.directory, name, f'{field}.npy'), array)
+        self.manifest['shards'].append(
+            {'name': name, 'player': player, 'episodes': len(batch)}
+        )
+        write_json(os.path.join(self.directory, MANIFEST), self.manifest)
+
+    def close(self):
+        for player in list(self.buffers):
+            self.flush(player)
+
+
+class EpisodeReader:
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest = read_manifest(directory)
+        self.info = self.manifest['info']
+
+    def check(self, learner):
+        if (
+            self.info.get('board') != [learner.size, learner.k]
+            or self.info.get('symmetry') != learner.symmetry
+        ):
+            raise ValueError(f"{self.directory} was logged for another board")
+
+    def episodes(self, player=None):
+        return sum(
+            shard['episodes']
+            for shard in self.manifest['shards']
+            if player is None or shard['player'] == player
+        )
+
+    def open_shard(self, shard):
+        return {
+            field: np.load(
+                os.path.join(self.directory, shard['name'], f'{field}.npy'),
+                mmap_mode='r',
+            )
+            for field in FIELDS
+        }
+
+    def batches(self, player, batch_size):
+        # Trajectories of batch_size games at a time, shard after shard.
+        for shard in self.manifest['shards']:
+            if shard['player'] != player:
+                continue
+            arrays = self.open_shard(shard)
+            for start in range(0, shard['episodes'], batch_size):
+                part = slice(start, start + batch_size)
+                lengths = arrays['lengths'][part].astype(np.int64)
+                rewards = np.zeros(arrays['probs'][part].shape)
+                rewards[np.arange(len(lengths)), np.maximum(lengths - 1, 0)] = arrays[
+                    'outcomes'
+                ][part]
+                yield Trajectories(
+                    arrays['states'][part].astype(np.int64),
+                    arrays['actions'][part].astype(np.int8),
+                    arrays['probs'][part].astype(np.float64),
+                    rewards,
+                    lengths,
+                    arrays['final_states'][part].astype(np.int64),
+                )
+            del arrays
+
+
+def concatenate(batches):
+    if len(batches) == 1:
+        return batches[0]
+    width = max(batch.states.shape[1] for batch in batches)
+
+    def pad(array, fill):
+        return np.pad(
+            array, ((0, 0), (0, width - array.shape[1])), constant_values=fill
+        )
+
+    return Trajectories(
+        np.concatenate([pad(b.states, 0) for b in batches]),
+        np.concatenate([pad(b.actions, 0) for b in batches]),
+        np.concatenate([pad(b.probs, 1) for b in batches]),
+        np.concatenate([pad(b.rewards, 0) for b in batches]),
+        np.concatenate([b.lengths for b in batches]),
+        np.concatenate([b.final_states for b in batches]),
+    )
+
+
+def slice_batch(batch, start, stop):
+    part = slice(start, stop)
+    return Trajectories(
+        batch.states[part],
+        batch.actions[part],
+        batch.probs[part],
+        batch.rewards[part],
+        batch.lengths[part],
+        batch.final_states[part],
+    )
+
+
+def record_episodes(
+    learner,
+    directory,
+    num_episodes,
+    split_ratio=0.5,
+    batch_size=1000,
+    shard_size=100_000,
+):
+    # Plays num_episodes with the learner's current Q and epsilon (nothing is
+    # learned) and logs them to `directory`, shared between the two seats
+    # as in training.
+    learner.prepare_training()
+    info = {
+        'algorithm': type(learner).__name__,
+        'board': [learner.size, learner.k],
+        'symmetry': learner.symmetry,
+        'epsilon': float(learner.epsilon),
+    }
+    state_dtype = np.uint16 if learner.grid is None else np.int64
+    episodes = {
+        learner.PLAYER_X: int(split_ratio * num_episodes),
+        learner.PLAYER_O: num_episodes - int(split_ratio * num_episodes),
+    }
+    with EpisodeWriter(directory, state_dtype, shard_size, info) as writer:
+        for player, total in episodes.items():
+            for start in range(0, total, batch_size):
+                batch = learner.simulator.run(
+                    learner.Q[player],
+                    player,
+                    min(batch_size, total - start),
+                    learner.epsilon,
+                )
+                writer.write(player, batch)
+    return writer.manifest
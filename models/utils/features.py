@@ -0,0 +1,70 @@
+from functools import lru_cache
+import numpy as np
+from .encoding import all_boards
+from .grid import popcount
+
+
+class LineFeatures:
+    # Features of a position on a Board from one side's point of view,
+    # computed from the two bitboards for any array shape at once: a bias,
+    # the number of lines holding exactly n of our marks and none of theirs
+    # for n = 1..k (open twos, threes, ..., wins), the same for the opponent,
+    # whether either side has two or more lines one mark short of a win (a
+    # fork), and our and their marks on the centre and on the corners.
+    def __init__(self, board):
+        self.board = board
+        size = board.size
+        middle = [(size - 1) // 2, size // 2]
+        centre = {row * size + col for row in middle for col in middle}
+        corners = [0, size - 1, size * (size - 1), size * size - 1]
+        self.centre = np.uint64(board.bits[sorted(centre)].sum())
+        self.corners = np.uint64(board.bits[corners].sum())
+        self.num_features = 2 * board.k + 7
+
+    def histogram(self, counts):
+        # How many lines of each position hold 1..k marks, in one bincount
+        # rather than a comparison per count.
+        shape = counts.shape[:-1]
+        size = int(np.prod(shape))
+        bins = self.board.k + 1
+        offsets = np.arange(size)[:, None] * bins
+        flat = np.bincount(
+            (offsets + counts.reshape(size, -1)).ravel(), minlength=size * bins
+        )
+        return flat.reshape(shape + (bins,))[..., 1:]
+
+    def __call__(self, mine, theirs):
+        mine, theirs = np.broadcast_arrays(mine, theirs)
+        lines = self.board.lines
+        ours = popcount(mine[..., None] & lines)
+        other = popcount(theirs[..., None] & lines)
+        open_ours = self.histogram(np.where(other == 0, ours, 0))
+        open_other = self.histogram(np.where(ours == 0, other, 0))
+        threats = max(self.board.k - 2, 0)
+        return np.concatenate(
+            [
+                np.ones(mine.shape + (1,)),
+                open_ours,
+                open_other,
+                np.stack(
+                    [
+                        open_ours[..., threats] >= 2,
+                        open_other[..., threats] >= 2,
+                        popcount(mine & self.centre),
+                        popcount(theirs & self.centre),
+                        popcount(mine & self.corners),
+                        popcount(theirs & self.corners),
+                    ],
+                    axis=-1,
+                ),
+            ],
+            axis=-1,
+        ).astype(np.float64)
+
+
+@lru_cache(maxsize=None)
+def code_keys():
+    # Board bitboard key of every base-3 encoded 3x3 board.
+    boards = all_boards()
+    bits = 1 << np.arange(9, dtype=np.int64)
+    return ((boards == 1) @ bits) | (((boards == 2) @ bits) << 9)
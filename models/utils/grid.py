@@ -0,0 +1,229 @@
+import numpy as np
+from .metrics import NULL_METRICS
+from .random_stream import RandomStream
+from .simulator import Trajectories
+
+DIRECTIONS = [(0, 1), (1, 0), (1, 1), (1, -1)]
+BYTE_COUNTS = np.array([bin(byte).count('1') for byte in range(256)], np.uint8)
+
+
+def popcount(values):
+    # Set bits of each uint64, as np.bitwise_count, which needs NumPy 2.0.
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    flat = np.ascontiguousarray(values, dtype=np.uint64).reshape(-1)
+    counts = BYTE_COUNTS[flat.view(np.uint8)].reshape(np.shape(values) + (8,))
+    return counts.sum(axis=-1, dtype=np.uint8)
+
+
+class Board:
+    # An N x N board won by k in a row. A position is a pair of bitboards
+    # (x, o) with cell row * size + col as bit i, packed into one int64 key
+    # x | o << cells. Everything works on arrays of positions at once.
+    MAX_CELLS = 31
+
+    def __init__(self, size=3, k=None):
+        self.size = size
+        self.k = size if k is None else k
+        self.num_cells = size * size
+        if not 1 <= self.k <= size:
+            raise ValueError(f"k must be between 1 and {size}")
+        if self.num_cells > self.MAX_CELLS:
+            raise ValueError(f"boards above {self.MAX_CELLS} cells do not fit a key")
+
+        self.bits = np.left_shift(
+            np.uint64(1), np.arange(self.num_cells, dtype=np.uint64)
+        )
+        self.full = np.uint64((1 << self.num_cells) - 1)
+        self.shift = np.uint64(self.num_cells)
+
+        lines, members = [], [[] for _ in range(self.num_cells)]
+        for row in range(size):
+            for col in range(size):
+                for d_row, d_col in DIRECTIONS:
+                    cells = [
+                        (row + d_row * step) * size + col + d_col * step
+                        for step in range(self.k)
+                        if 0 <= row + d_row * step < size
+                        and 0 <= col + d_col * step < size
+                    ]
+                    if len(cells) < self.k:
+                        continue
+                    for cell in cells:
+                        members[cell].append(len(lines))
+                    lines.append(int(self.bits[cells].sum()))
+        # Winning-line masks, and for every cell the masks of the lines
+        # through it (zero-padded), so a move only checks its own lines.
+        self.lines = np.array(lines, dtype=np.uint64)
+        width = max(len(cell_lines) for cell_lines in members)
+        self.cell_lines = np.zeros((self.num_cells, width), dtype=np.uint64)
+        for cell, cell_lines in enumerate(members):
+            self.cell_lines[cell, : len(cell_lines)] = self.lines[cell_lines]
+
+    def key(self, x, o):
+        return (x | (o << self.shift)).astype(np.int64)
+
+    def split(self, keys):
+        keys = np.asarray(keys).astype(np.uint64)
+        return keys & self.full, keys >> self.shift
+
+    def legal(self, keys):
+        x, o = self.split(keys)
+        free = ~(x | o) & self.full
+        return (free[:, None] & self.bits) != 0
+
+    def player(self, keys):
+        x, o = self.split(keys)
+        return np.where(popcount(x) == popcount(o), 1, 2)
+
+    def completes(self, marks, moves):
+        # Whether the mover's bitboard now holds a whole line through the
+        # cell just played.
+        masks = self.cell_lines[moves]
+        return (((marks[:, None] & masks) == masks) & (masks != 0)).any(axis=1)
+
+    def winner(self, keys):
+        x, o = self.split(keys)
+        x_won = ((x[:, None] & self.lines) == self.lines).any(axis=1)
+        o_won = ((o[:, None] & self.lines) == self.lines).any(axis=1)
+        return np.where(x_won, 1, np.where(o_won, 2, 0))
+
+    def encode(self, board):
+        cells = np.asarray(board).ravel()
+        x = int(self.bits[cells == 1].sum())
+        o = int(self.bits[cells == 2].sum())
+        return x | o << self.num_cells
+
+    def encode_batch(self, boards):
+        cells = np.asarray(boards).reshape(len(boards), self.num_cells)
+        bits = self.bits.astype(np.int64)
+        return ((cells == 1) @ bits) | (((cells == 2) @ bits) << self.num_cells)
+
+    def decode(self, key):
+        x, o = self.split([key])
+        board = np.where((x & self.bits) != 0, 1, 0) + np.where(
+            (o & self.bits) != 0, 2, 0
+        )
+        return board.reshape(self.size, self.size)
+
+
+class GridSimulator:
+    # BatchSimulator for a Board of any size: the learner plays
+    # epsilon-greedy moves from its Q store and the opponent is
+    # `opponent(keys) -> cells` or, by default, uniformly random.
+    def __init__(self, board, opponent=None, rng=None):
+        self.board = board
+        self.opponent = opponent
+        self.rng = rng if rng is not None else RandomStream()
+        self.metrics = NULL_METRICS
+
+    def opponent_actions(self, keys):
+        if self.opponent is not None:
+            return self.opponent(keys)
+        legal = self.board.legal(keys)
+        return np.where(legal, self.rng.random(legal.shape), -1.0).argmax(axis=1)
+
+    def run(self, Q, learner, num_games, epsilon):
+        board = self.board
+        max_steps = (board.num_cells + 2 - learner) // 2
+        states = np.zeros((num_games, max_steps), dtype=np.int64)
+        actions = np.zeros((num_games, max_steps), dtype=np.int8)
+        probs = np.ones((num_games, max_steps))
+        rewards = np.zeros((num_games, max_steps))
+        lengths = np.zeros(num_games, dtype=np.int64)
+
+        marks = {1: np.zeros(num_games, np.uint64), 2: np.zeros(num_games, np.uint64)}
+        games = np.arange(num_games)
+        for ply in range(board.num_cells):
+            if not len(games):
+                break
+            mover = 1 if ply % 2 == 0 else 2
+            keys = board.key(marks[1][games], marks[2][games])
+
+            if mover == learner:
+                with self.metrics.phase('selection'):
+                    moves, chosen = Q.epsilon_greedy(keys, epsilon, self.rng)
+                step = ply // 2
+                states[games, step] = keys
+                actions[games, step] = moves
+                probs[games, step] = chosen
+                lengths[games] += 1
+            else:
+                moves = self.opponent_actions(keys)
+
+            marks[mover][games] |= board.bits[moves]
+            won = board.completes(marks[mover][games], moves)
+            done = won | (ply == board.num_cells - 1)
+            finished = games[done]
+            outcome = 1.0 if mover == learner else -1.0
+            rewards[finished, lengths[finished] - 1] = np.where(won[done], outcome, 0.0)
+            games = games[~done]
+
+        final_states = board.key(marks[1], marks[2])
+        return Trajectories(states, actions, probs, rewards, lengths, final_states)
+
+
+class GridGame:
+    # The game methods of TicTacToe for learners that may play a larger
+    # board: with self.grid set they work on self.grid's N x N boards and
+    # look moves up in the learner's Q, otherwise they defer to TicTacToe.
+    # Listed before TicTacToe in the bases.
+    def grid_key(self, board):
+        board = np.asarray(board)
+        shape = (self.grid.size, self.grid.size)
+        if board.shape != shape:
+            raise ValueError(f"expected a {shape} board, got {board.shape}")
+        return self.grid.encode(board)
+
+    def possible_actions(self, board):
+        if self.grid is None:
+            return super().possible_actions(board)
+        legal = self.grid.legal([self.grid_key(board)])[0]
+        return [divmod(int(cell), self.grid.size) for cell in np.flatnonzero(legal)]
+
+    def winner(self, board):
+        if self.grid is None:
+            return super().winner(board)
+        return int(self.grid.winner([self.grid_key(board)])[0]) or None
+
+    def terminal(self, board):
+        if self.grid is None:
+            return super().terminal(board)
+        key = self.grid_key(board)
+        return bool(self.grid.winner([key])[0]) or not self.grid.legal([key]).any()
+
+    def grid_actions(self, keys):
+        # Greedy cell from Q for whoever is to move, -1 on finished boards.
+        self.prepare_training()
+        keys = np.asarray(keys, dtype=np.int64)
+        actions = np.full(len(keys), -1, dtype=np.int64)
+        live = (self.grid.winner(keys) == 0) & self.grid.legal(keys).any(axis=1)
+        players = self.grid.player(keys)
+        for player in (1, 2):
+            games = np.flatnonzero(live & (players == player))
+            if len(games):
+                actions[games] = self.Q[player].greedy(keys[games])
+        return actions
+
+    def grid_action(self):
+        cell = int(self.grid_actions([self.grid_key(self.board)])[0])
+        return None if cell < 0 else divmod(cell, self.grid.size)
+
+    def best_actions(self, boards):
+        # Boards or Board keys, as in TicTacToe.best_actions.
+        if self.grid is None:
+            return super().best_actions(boards)
+        boards = np.asarray(boards)
+        if boards.ndim == 1:
+            return self.grid_actions(boards)
+        for board in boards:
+            self.grid_key(board)
+        return self.grid_actions(self.grid.encode_batch(boards))
+
+    def play(self):
+        if self.grid is not None:
+            raise ValueError(
+                "the window only plays 3x3; use best_action or best_actions"
+                " on larger boards"
+            )
+        super().play()
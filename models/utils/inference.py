@@ -0,0 +1,98 @@
+from functools import lru_cache
+import numpy as np
+from .encoding import (
+    NUM_CELLS,
+    NUM_STATES,
+    decode,
+    encode,
+    encode_batch,
+    index_action,
+)
+from .policy_io import NO_ACTION, PolicyTable
+from .tables import LINES, lookup_tables
+
+# Centre first, then corners, then edges.
+PREFERENCE = [4, 0, 2, 6, 8, 1, 3, 5, 7]
+
+
+def as_codes(boards):
+    # Encoded states from either encoded states or boards of shape
+    # [..., 3, 3] / [..., 9].
+    boards = np.asarray(boards)
+    if boards.ndim >= 2 and boards.shape[-1] in (3, NUM_CELLS):
+        return encode_batch(boards)
+    return boards.astype(np.int64).reshape(-1)
+
+
+def heuristic_action(code):
+    # Win if possible, otherwise block, otherwise the best free cell by
+    # PREFERENCE; -1 when the board is full or already decided.
+    tables = lookup_tables()
+    if tables.terminal[code]:
+        return -1
+    board = decode(code).ravel()
+    player = int(tables.player[code])
+    cells = board[LINES]
+    open_lines = np.count_nonzero(cells == 0, axis=1) == 1
+    for mark in (player, 3 - player):
+        hits = open_lines & (np.count_nonzero(cells == mark, axis=1) == 2)
+        if hits.any():
+            line = LINES[hits.argmax()]
+            return int(line[board[line] == 0][0])
+    for cell in PREFERENCE:
+        if board[cell] == 0:
+            return cell
+    return -1
+
+
+class PolicyEngine:
+    # Vectorized move lookup over many boards at once. Boards the table has
+    # no move for go to `fallback(code) -> cell`, which is memoized in an
+    # LRU cache of `cache_size` positions.
+    def __init__(self, policy, fallback=heuristic_action, cache_size=4096):
+        self.policy = policy
+        self.table = policy.expanded()
+        self.fallback = lru_cache(maxsize=cache_size)(fallback)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        return cls(PolicyTable.load(path), **kwargs)
+
+    def actions(self, boards):
+        # Cell index (row * 3 + col) per board, -1 for finished or invalid
+        # boards.
+        codes = as_codes(boards)
+        valid = (codes >= 0) & (codes < NUM_STATES)
+        safe = np.where(valid, codes, 0)
+        tables = lookup_tables()
+        live = valid & tables.valid[safe] & ~tables.terminal[safe]
+
+        stored = self.table[safe].astype(np.int64)
+        actions = np.where(live & (stored != NO_ACTION), stored, -1)
+        missing = np.flatnonzero(live & (stored == NO_ACTION))
+        if len(missing):
+            unique, inverse = np.unique(codes[missing], return_inverse=True)
+            moves = np.array([self.fallback(int(code)) for code in unique.tolist()])
+            actions[missing] = moves[inverse]
+        return actions
+
+    def action(self, board):
+        # Single-board version of actions() without the array overhead.
+        code = encode(board)
+        tables = lookup_tables()
+        if not 0 <= code < NUM_STATES or not tables.valid[code]:
+            return -1
+        if tables.terminal[code]:
+            return -1
+        stored = int(self.table[code])
+        return stored if stored != NO_ACTION else self.fallback(code)
+
+    def moves(self, boards):
+        # Like actions(), as (row, col) tuples with None for "no move".
+        return [
+            index_action(action) if action >= 0 else None
+            for action in self.actions(boards).tolist()
+        ]
+
+    def cache_info(self):
+        return self.fallback.cache_info()
@@ -0,0 +1,95 @@
+import numpy as np
+from .encoding import NUM_STATES
+from .features import LineFeatures, code_keys
+from .policy_io import NO_ACTION
+from .random_stream import choose
+from .statespace import reachable_states
+from .tables import lookup_tables
+
+
+class LinearQ:
+    # Q(s, a) = w . phi(s after a) for one learner: phi are the LineFeatures
+    # of the position right after the learner's move, from its own side, so
+    # positions that look alike share what was learned about them and memory
+    # does not grow with the state space. States are Board keys, or encoded
+    # 3x3 boards when `codes` is set. Offers the QTable methods the
+    # simulators and learners use.
+    def __init__(self, board, player, codes=False):
+        self.board = board
+        self.player = player
+        self.features = LineFeatures(board)
+        self.codes = code_keys() if codes else None
+        self.weights = np.zeros(self.features.num_features)
+
+    @property
+    def nbytes(self):
+        return self.weights.nbytes
+
+    def keys(self, states):
+        states = np.asarray(states)
+        return states if self.codes is None else self.codes[states]
+
+    def sides(self, keys):
+        x, o = self.board.split(keys)
+        return (x, o) if self.player == 1 else (o, x)
+
+    def action_values(self, states):
+        keys = self.keys(states)
+        mine, theirs = self.sides(keys)
+        after = mine[:, None] | self.board.bits
+        values = self.features(after, theirs[:, None]) @ self.weights
+        return values, self.board.legal(keys)
+
+    def __getitem__(self, state):
+        return self.action_values([state])[0][0]
+
+    def greedy(self, states):
+        values, legal = self.action_values(states)
+        return np.where(legal, values, -np.inf).argmax(axis=1)
+
+    def max_values(self, states):
+        # Best legal value per state; 0 without a legal move or for -1.
+        states = np.asarray(states)
+        values, legal = self.action_values(np.maximum(states, 0))
+        best = np.where(legal, values, -np.inf).max(axis=1)
+        return np.where((states >= 0) & legal.any(axis=1), best, 0)
+
+    def epsilon_greedy(self, states, epsilon, rng):
+        values, legal = self.action_values(states)
+        values = np.where(legal, values, -np.inf)
+        best = legal & (values == values.max(axis=1, keepdims=True))
+        probs = legal * (epsilon / legal.sum(axis=1, keepdims=True)) + best * (
+            (1.0 - epsilon) / best.sum(axis=1, keepdims=True)
+        )
+
+        actions = choose(rng, probs)
+        return actions, probs[np.arange(len(probs)), actions]
+
+    def phi(self, states, actions):
+        mine, theirs = self.sides(self.keys(states))
+        return self.features(mine | self.board.bits[actions], theirs)
+
+    def get(self, states, actions):
+        return self.phi(states, actions) @ self.weights
+
+    def update(self, states, actions, targets, alpha):
+        # One semi-gradient step on the mean squared error over the batch.
+        phi = self.phi(states, actions)
+        errors = targets - phi @ self.weights
+        self.weights += alpha * (errors @ phi) / len(errors)
+        return errors
+
+    def maintain(self):
+        pass
+
+    def policy(self):
+        # Greedy move on every reachable 3x3 board where this learner is to
+        # move, as a uint8 array indexed by encoded state.
+        tables = lookup_tables()
+        states = reachable_states()
+        states = states[
+            (tables.player[states] == self.player) & ~tables.terminal[states]
+        ]
+        policy = np.full(NUM_STATES, NO_ACTION, dtype=np.uint8)
+        policy[states] = self.greedy(states)
+        return policy
@@ -0,0 +1,139 @@
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+# Training reports records (plain dicts with an 'event' key) to sinks, which
+# are any callables taking a record. Training code always talks to a metrics
+# object; when none is given it gets NULL_METRICS, whose methods do nothing.
+
+
+class JSONLinesSink:
+    def __init__(self, path):
+        self.file = open(path, 'a')
+
+    def __call__(self, record):
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class Counters:
+    # In-process sink: how many records of each event were seen, the latest
+    # record of each and, optionally, all of them.
+    def __init__(self, keep=True):
+        self.counts = defaultdict(int)
+        self.latest = {}
+        self.records = [] if keep else None
+
+    def __call__(self, record):
+        self.counts[record['event']] += 1
+        self.latest[record['event']] = record
+        if self.records is not None:
+            self.records.append(record)
+
+
+class Metrics:
+    # Collects per-phase timings and episode statistics over a window of
+    # `every` episodes and emits one 'progress' record per window. Phase
+    # times are exclusive: time spent in a nested phase is not counted
+    # again in the enclosing one.
+    enabled = True
+
+    def __init__(self, *sinks, every=10_000):
+        self.sinks = list(sinks)
+        self.every = every
+        self.stack = []
+        self.reset()
+
+    def reset(self):
+        self.times = defaultdict(float)
+        self.stats = {}
+        self.window_episodes = 0
+        self.window_return = 0.0
+        self.returns_known = True
+        self.window_start = time.perf_counter()
+
+    def emit(self, event, **values):
+        record = {'event': event, 'time': time.time(), **values}
+        for sink in self.sinks:
+            sink(record)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        self.stack.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self.stack.pop()
+            self.times[name] += elapsed - nested
+            if self.stack:
+                self.stack[-1] += elapsed
+
+    def observe(self, name, values):
+        # Running count, sum and max of a statistic, e.g. importance weights.
+        count, total, largest = self.stats.get(name, (0, 0.0, float('-inf')))
+        if len(values):
+            self.stats[name] = (
+                count + len(values),
+                total + float(values.sum()),
+                max(largest, float(values.max())),
+            )
+
+    def episodes(self, count, total_return, describe):
+        # describe() returns the learner's own figures (epsilon, Q size, ...)
+        # and is only called when a record is actually emitted.
+        self.window_episodes += count
+        if total_return is None:
+            self.returns_known = False
+        else:
+            self.window_return += float(total_return)
+        if self.window_episodes >= self.every:
+            self.flush(describe)
+
+    def flush(self, describe):
+        if not self.window_episodes:
+            return
+        elapsed = time.perf_counter() - self.window_start
+        record = {
+            'window_episodes': self.window_episodes,
+            'episodes_per_s': self.window_episodes / elapsed,
+            'mean_return': (
+                self.window_return / self.window_episodes
+                if self.returns_known
+                else None
+            ),
+            'phase_seconds': dict(self.times),
+        }
+        for name, (count, total, largest) in self.stats.items():
+            record[f'{name}_mean'] = total / count
+            record[f'{name}_max'] = largest
+        record.update(describe())
+        self.emit('progress', **record)
+        self.reset()
+
+
+class NullMetrics:
+    enabled = False
+
+    def emit(self, event, **values):
+        pass
+
+    def phase(self, name):
+        return nullcontext()
+
+    def observe(self, name, values):
+        pass
+
+    def episodes(self, count, total_return, describe):
+        pass
+
+    def flush(self, describe):
+        pass
+
+
+NULL_METRICS = NullMetrics()
@@ -0,0 +1,200 @@
+import os
+import pickle
+import struct
+import tempfile
+import numpy as np
+from .encoding import NUM_STATES, action_index, decode, index_action, migrate_keys
+from .statespace import (
+    PERMUTATIONS,
+    canonical_states,
+    reachable_states,
+    state_key,
+    symmetry_tables,
+)
+
+# On-disk layout: a 16 byte header followed by one uint8 action (cell index,
+# NO_ACTION where the policy has no move) per state. With the base-3
+# encoding the array is indexed directly by the encoded board; with the
+# reachable encoding it is indexed by position in the sorted list of
+# reachable (or, with symmetry, canonical) states.
+MAGIC = b'TTTP'
+VERSION = 1
+HEADER = struct.Struct('<4sHBBB3xI')
+NO_ACTION = 255
+
+ALGORITHMS = ['unknown', 'mdp', 'mc', 'td', 'linear_td']
+ENCODING_BASE3 = 0
+ENCODING_REACHABLE = 1
+
+
+def merge_actions(*tables):
+    merged = np.full(NUM_STATES, NO_ACTION, dtype=np.uint8)
+    for table in tables:
+        merged = np.where(merged == NO_ACTION, table, merged)
+    return merged
+
+
+class PolicyTable:
+    def __init__(
+        self,
+        actions,
+        algorithm='unknown',
+        symmetry=False,
+        encoding=ENCODING_BASE3,
+    ):
+        self.actions = actions
+        self.algorithm = algorithm
+        self.symmetry = symmetry
+        self.encoding = encoding
+        self.states = None
+        self.expanded_actions = None
+        if encoding == ENCODING_REACHABLE:
+            self.states = canonical_states() if symmetry else reachable_states()
+
+    @classmethod
+    def from_dict(cls, policy, algorithm='unknown', symmetry=False):
+        actions = np.full(NUM_STATES, NO_ACTION, dtype=np.uint8)
+        for state, action in migrate_keys(policy).items():
+            actions[state] = action_index(action)
+        return cls(actions, algorithm, symmetry)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            magic, version, algorithm, encoding, symmetry, count = HEADER.unpack(
+                f.read(HEADER.size)
+            )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} policy file")
+        actions = np.memmap(
+            path, dtype=np.uint8, mode='r', offset=HEADER.size, shape=(count,)
+        )
+        return cls(actions, ALGORITHMS[algorithm], bool(symmetry), encoding)
+
+    def save(self, path, encoding=None):
+        encoding = self.encoding if encoding is None else encoding
+        actions = self.dense()
+        if encoding == ENCODING_REACHABLE:
+            actions = actions[
+                canonical_states() if self.symmetry else reachable_states()
+            ]
+        # Written next to the target and moved into place: other processes
+        # may have the old file memory-mapped, and truncating it under them
+        # would crash them.
+        fd, temporary = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp'
+        )
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(
+                    HEADER.pack(
+                        MAGIC,
+                        VERSION,
+                        ALGORITHMS.index(self.algorithm),
+                        encoding,
+                        self.symmetry,
+                        len(actions),
+                    )
+                )
+                f.write(np.ascontiguousarray(actions, dtype=np.uint8).tobytes())
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+
+    def index(self, state):
+        if self.states is None:
+            return state
+        position = np.searchsorted(self.states, state)
+        if position < len(self.states) and self.states[position] == state:
+            return position
+        return -1
+
+    def dense(self):
+        # Actions indexed directly by encoded state, in the stored frame.
+        if self.states is None:
+            return self.actions
+        actions = np.full(NUM_STATES, NO_ACTION, dtype=np.uint8)
+        actions[self.states] = self.actions
+        return actions
+
+    def expanded(self):
+        # Actions for every board in its own frame, ready for array lookups.
+        # Built once per table.
+        if self.expanded_actions is not None:
+            return self.expanded_actions
+        actions = self.dense()
+        if self.symmetry:
+            codes, transforms = symmetry_tables()
+            stored = actions[codes]
+            known = stored != NO_ACTION
+            mapped = PERMUTATIONS[transforms, np.where(known, stored, 0)]
+            actions = np.where(known, mapped, NO_ACTION).astype(np.uint8)
+        self.expanded_actions = actions
+        return actions
+
+    def __len__(self):
+        return int(np.count_nonzero(np.asarray(self.actions) != NO_ACTION))
+
+    def __contains__(self, state):
+        key, _ = state_key(state, self.symmetry)
+        index = self.index(key)
+        return index >= 0 and self.actions[index] != NO_ACTION
+
+    def action(self, state):
+        # The move for an encoded board, in the board's own frame, or None.
+        key, transform = state_key(state, self.symmetry)
+        index = self.index(key)
+        if index < 0 or self.actions[index] == NO_ACTION:
+            return None
+        return index_action(int(PERMUTATIONS[transform][self.actions[index]]))
+
+    def __getitem__(self, state):
+        action = self.action(state)
+        if action is None:
+            raise KeyError(state)
+        return action
+
+    def items(self):
+        actions = self.dense()
+        for state in np.flatnonzero(actions != NO_ACTION).tolist():
+            yield state, index_action(int(actions[state]))
+
+
+def convert_pickle(source, destination, algorithm='unknown', symmetry=False):
+    with open(source, 'rb') as f:
+        policy = PolicyTable.from_dict(pickle.load(f), algorithm, symmetry)
+    policy.save(destination)
+    return policy
+
+
+def convert_policy(source, destination, algorithm=None, symmetry=False, encoding=None):
+    # Between .policy files and legacy pickled dicts (.pkl), chosen by file
+    # extension. A pickle carries neither the algorithm nor the symmetry
+    # flag, so those are taken from the arguments when reading one; a
+    # .policy destination is written in `encoding`, or the source's.
+    if source.endswith('.pkl'):
+        with open(source, 'rb') as f:
+            policy = PolicyTable.from_dict(
+                pickle.load(f), algorithm or 'unknown', symmetry
+            )
+    else:
+        policy = PolicyTable.load(source)
+        # Off the memory map, so the source can be rewritten in place.
+        policy.actions = np.array(policy.actions)
+        if algorithm is not None:
+            policy.algorithm = algorithm
+    if destination.endswith('.pkl'):
+        # Keyed by tuple-of-tuples boards, every board in its own frame, as
+        # the original pickle loaders look moves up.
+        actions = policy.expanded()
+        legacy = {
+            tuple(map(tuple, decode(state).tolist())): index_action(int(actions[state]))
+            for state in np.flatnonzero(actions != NO_ACTION).tolist()
+        }
+        with open(destination, 'wb') as f:
+            pickle.dump(legacy, f)
+    else:
+        policy.save(destination, encoding)
+    return policy
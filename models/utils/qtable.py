@@ -0,0 +1,93 @@
+import numpy as np
+from .encoding import NUM_CELLS, NUM_STATES
+from .policy_io import NO_ACTION
+from .random_stream import choose
+from .tables import lookup_tables
+
+
+class QTable:
+    # Action values in one contiguous [num_states, 9] float32 array. States
+    # are encoded boards; when `states` is given only those boards get a row
+    # and `index` maps a code to its row (-1 for boards without one).
+    # `values` and `visited` may be passed in to wrap existing buffers, such
+    # as arrays in shared memory.
+    def __init__(self, states=None, dtype=np.float32, values=None, visited=None):
+        if states is None:
+            states = np.arange(NUM_STATES)
+        self.states = np.asarray(states, dtype=np.int64)
+        self.index = np.full(NUM_STATES, -1, dtype=np.int64)
+        self.index[self.states] = np.arange(len(self.states))
+
+        shape = (len(self.states), NUM_CELLS)
+        self.values = np.zeros(shape, dtype=dtype) if values is None else values
+        self.visited = np.zeros(shape, dtype=bool) if visited is None else visited
+        self.legal = lookup_tables().empty[self.states]
+
+    def __len__(self):
+        return len(self.states)
+
+    def __getitem__(self, state):
+        return self.values[self.index[state]]
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.visited.nbytes + self.legal.nbytes
+
+    def rows(self, states, insert=False):
+        # Every state already has a row; insert is for SparseQTable.
+        return self.index[states]
+
+    def masked(self, rows, fill):
+        return np.where(self.legal[rows], self.values[rows], fill)
+
+    def greedy(self, states):
+        return self.masked(self.rows(states), -np.inf).argmax(axis=1)
+
+    def max_values(self, states):
+        # Best legal value per state; 0 for terminal boards and for -1, which
+        # callers use to mark "no next state".
+        rows = self.rows(states)
+        best = self.masked(rows, -np.inf).max(axis=1)
+        live = (rows >= 0) & self.legal[rows].any(axis=1)
+        return np.where(live, best, 0)
+
+    def epsilon_greedy(self, states, epsilon, rng):
+        rows = self.rows(states)
+        legal = self.legal[rows]
+        values = self.masked(rows, -np.inf)
+        best = legal & (values == values.max(axis=1, keepdims=True))
+        probs = legal * (epsilon / legal.sum(axis=1, keepdims=True)) + best * (
+            (1.0 - epsilon) / best.sum(axis=1, keepdims=True)
+        )
+
+        actions = choose(rng, probs)
+        return actions, probs[np.arange(len(probs)), actions]
+
+    def get(self, states, actions):
+        return self.values[self.rows(states), actions]
+
+    def set(self, states, actions, values):
+        rows = self.rows(states)
+        self.values[rows, actions] = values
+        self.visited[rows, actions] = True
+
+    def attach(self, array):
+        pass
+
+    def maintain(self):
+        pass
+
+    def restore(self, values, visited, states=None, counts=None):
+        self.values[:] = values
+        self.visited[:] = visited
+
+    def policy(self):
+        # Greedy action over the visited actions of every visited state, as
+        # a uint8 array indexed by encoded state (NO_ACTION elsewhere).
+        rows = np.flatnonzero(self.visited.any(axis=1))
+        actions = np.where(self.visited[rows], self.values[rows], -np.inf).argmax(
+            axis=1
+        )
+        policy = np.full(NUM_STATES, NO_ACTION, dtype=np.uint8)
+        policy[self.states[rows]] = actions
+        return policy
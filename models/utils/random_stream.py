@@ -0,0 +1,98 @@
+import math
+import numpy as np
+
+
+class RandomStream:
+    # Uniform floats from a np.random.Generator. Small requests (single
+    # episodes, scalar picks) are served from blocks drawn block_size at a
+    # time, so they cost a slice instead of a generator call; batch-sized
+    # requests go to the generator directly. The values come out in exactly the
+    # order direct Generator.random calls would give them, so a seeded stream
+    # matches np.random.default_rng(seed) draw for draw. `seed` is anything
+    # SeedSequence takes, or a SeedSequence; spawn() gives independent
+    # sub-streams for parallel workers.
+    DIRECT = 256
+
+    def __init__(self, seed=None, block_size=4096):
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seeds = seed
+        self.block_size = block_size
+        self.generator = np.random.default_rng(seed)
+        self.block_state = None
+        self.block = np.empty(0)
+        self.position = 0
+
+    def spawn(self, count):
+        return [
+            RandomStream(seeds, self.block_size) for seeds in self.seeds.spawn(count)
+        ]
+
+    def refill(self, count):
+        self.block_state = self.generator.bit_generator.state
+        self.block = self.generator.random(max(self.block_size, count))
+        self.position = 0
+
+    def random(self, size=None):
+        if size is None:
+            count = 1
+        elif isinstance(size, int):
+            count = size
+        else:
+            count = math.prod(size)
+        left = len(self.block) - self.position
+        if not left and count >= self.DIRECT:
+            return self.generator.random(size)
+        if count <= left:
+            values = self.block[self.position : self.position + count]
+            self.position += count
+        elif count - left >= self.DIRECT:
+            # Batch-sized requests gain nothing from the block and go straight
+            # to the generator, after whatever is left of the block.
+            values = self.generator.random(count - left)
+            if left:
+                values = np.concatenate([self.block[self.position :], values])
+            self.block = np.empty(0)
+            self.position = 0
+        else:
+            rest = self.block[self.position :]
+            self.refill(count - left)
+            values = np.concatenate([rest, self.block[: count - left]])
+            self.position = count - left
+        if size is None:
+            return float(values[0])
+        return values.reshape(size)
+
+    @property
+    def state(self):
+        # JSON-friendly: the generator state the current block was drawn
+        # from, its size and how much of it has been used.
+        if self.position == len(self.block):
+            return {
+                'generator': self.generator.bit_generator.state,
+                'size': 0,
+                'position': 0,
+            }
+        return {
+            'generator': self.block_state,
+            'size': len(self.block),
+            'position': self.position,
+        }
+
+    @state.setter
+    def state(self, state):
+        if 'position' not in state:
+            # A plain bit generator state, as saved by older checkpoints.
+            state = {'generator': state, 'size': 0, 'position': 0}
+        self.generator.bit_generator.state = state['generator']
+        self.block_state = state['generator']
+        self.block = self.generator.random(state['size'])
+        self.position = state['position']
+
+
+def choose(rng, probs):
+    # One index per row of probs, found by comparing a uniform draw with the
+    # row's running sums instead of a generic weighted choice per row.
+    cumulative = probs.cumsum(axis=1)
+    draws = rng.random(len(probs))[:, None] * cumulative[:, -1:]
+    return np.minimum((cumulative <= draws).sum(axis=1), probs.shape[1] - 1)
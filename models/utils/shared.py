@@ -0,0 +1,34 @@
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+
+
+class SharedArray:
+    # A NumPy array living in a named shared memory block. The creating
+    # process owns the block and unlinks it; workers attach by spec().
+    def __init__(self, shape, dtype, name=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        if name is None:
+            size = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+            self.shm = SharedMemory(create=True, size=size)
+        else:
+            self.shm = SharedMemory(name=name)
+        self.array = np.ndarray(self.shape, self.dtype, buffer=self.shm.buf)
+        if name is None:
+            self.array.fill(0)
+
+    @classmethod
+    def attach(cls, spec):
+        name, shape, dtype = spec
+        return cls(shape, dtype, name)
+
+    def spec(self):
+        return self.shm.name, self.shape, self.dtype.str
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+
+    def unlink(self):
+        self.close()
+        self.shm.unlink()
@@ -0,0 +1,107 @@
+import numpy as np
+from .encoding import NUM_CELLS, POW3, index_action
+from .metrics import NULL_METRICS
+from .policy_io import NO_ACTION, PolicyTable
+from .random_stream import RandomStream
+from .statespace import PERMUTATIONS, symmetry_tables
+from .tables import lookup_tables
+
+
+class Trajectories:
+    # Learner decision steps of a batch of games, padded to the longest
+    # game. Row i holds lengths[i] steps; rewards are from the learner's
+    # point of view and only the last step of each game is non-zero.
+    def __init__(self, states, actions, probs, rewards, lengths, final_states):
+        self.states = states
+        self.actions = actions
+        self.probs = probs
+        self.rewards = rewards
+        self.lengths = lengths
+        self.final_states = final_states
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def mask(self):
+        return np.arange(self.states.shape[1]) < self.lengths[:, None]
+
+    def episode(self, index):
+        length = self.lengths[index]
+        return (
+            self.states[index, :length].tolist(),
+            [index_action(a) for a in self.actions[index, :length].tolist()],
+            self.rewards[index, :length].tolist(),
+            self.probs[index, :length].tolist(),
+        )
+
+
+class BatchSimulator:
+    # Plays many games in lockstep: the learner picks epsilon-greedy moves
+    # from a QTable, the opponent follows a policy table and falls back to a
+    # random legal move where it has no entry.
+    def __init__(self, opponent_policy, symmetry=False, rng=None):
+        if isinstance(opponent_policy, PolicyTable):
+            opponent_policy = opponent_policy.expanded()
+        self.opponent = opponent_policy
+        self.symmetry = symmetry
+        self.rng = rng if rng is not None else RandomStream()
+        self.tables = lookup_tables()
+        self.metrics = NULL_METRICS
+
+    def opponent_actions(self, states):
+        actions = self.opponent[states].astype(np.int64)
+        missing = np.flatnonzero(actions == NO_ACTION)
+        if len(missing):
+            legal = self.tables.empty[states[missing]]
+            scores = np.where(legal, self.rng.random(legal.shape), -1.0)
+            actions[missing] = scores.argmax(axis=1)
+        return actions
+
+    def run(self, Q, learner, num_games, epsilon):
+        max_steps = (NUM_CELLS + 2 - learner) // 2
+        states = np.zeros((num_games, max_steps), dtype=np.int64)
+        actions = np.zeros((num_games, max_steps), dtype=np.int8)
+        probs = np.ones((num_games, max_steps))
+        rewards = np.zeros((num_games, max_steps))
+        lengths = np.zeros(num_games, dtype=np.int64)
+
+        codes = np.zeros(num_games, dtype=np.int64)
+        games = np.arange(num_games)
+        if self.symmetry:
+            canonical_codes, transforms = symmetry_tables()
+
+        # Every game starts from the empty board, so all live games are at the
+        # same ply and it is the same player's turn in each of them.
+        for ply in range(NUM_CELLS):
+            if not len(games):
+                break
+            mover = 1 if ply % 2 == 0 else 2
+            current = codes[games]
+
+            if mover == learner:
+                keys = canonical_codes[current] if self.symmetry else current
+                with self.metrics.phase('selection'):
+                    key_actions, chosen = Q.epsilon_greedy(keys, epsilon, self.rng)
+                step = ply // 2
+                states[games, step] = keys
+                actions[games, step] = key_actions
+                probs[games, step] = chosen
+                lengths[games] += 1
+                if self.symmetry:
+                    moves = PERMUTATIONS[transforms[current], key_actions]
+                else:
+                    moves = key_actions
+            else:
+                moves = self.opponent_actions(current)
+
+            codes[games] = current + mover * POW3[moves]
+
+            done = self.tables.terminal[codes[games]]
+            finished = games[done]
+            winner = self.tables.winner[codes[finished]]
+            rewards[finished, lengths[finished] - 1] = np.where(
+                winner == learner, 1.0, np.where(winner == 0, 0.0, -1.0)
+            )
+            games = games[~done]
+
+        return Trajectories(states, actions, probs, rewards, lengths, codes)
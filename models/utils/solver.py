@@ -0,0 +1,67 @@
+from functools import lru_cache
+import numpy as np
+from .encoding import NUM_CELLS, NUM_STATES, POW3, all_boards
+from .policy_io import NO_ACTION
+from .tables import lookup_tables
+
+
+class Solver:
+    # Exact minimax values of every board by backward induction over the
+    # number of pieces, all boards of one layer at a time. A value is from
+    # X's point of view: 1 + empty cells left at the end for an X win, the
+    # negation for an O win, 0 for a draw, so its sign is the game-theoretic
+    # result and its size prefers quicker wins and slower losses.
+    def __init__(self):
+        tables = lookup_tables()
+        boards = all_boards()
+        pieces = np.count_nonzero(boards, axis=1)
+        codes = np.arange(NUM_STATES)
+
+        self.legal = tables.empty & (tables.valid & ~tables.terminal)[:, None]
+        self.player = tables.player
+        self.successors = np.where(
+            self.legal, codes[:, None] + tables.player[:, None] * POW3, codes[:, None]
+        )
+
+        self.values = np.zeros(NUM_STATES, dtype=np.int8)
+        done = tables.valid & tables.terminal
+        score = (1 + NUM_CELLS - pieces).astype(np.int8)
+        self.values[done] = np.select(
+            [tables.winner == 1, tables.winner == 2], [score, -score], 0
+        )[done]
+        for count in range(NUM_CELLS - 1, -1, -1):
+            layer = np.flatnonzero(tables.valid & ~tables.terminal & (pieces == count))
+            self.values[layer] = self.best(layer, self.values[self.successors[layer]])
+
+        self.action_values = self.values[self.successors]
+        outcomes = np.sign(self.action_values)
+        best = np.sign(self.values)[:, None]
+        self.optimal = self.legal & (outcomes == best)
+
+    def best(self, rows, action_values):
+        return np.where(
+            self.player[rows] == 1,
+            np.where(self.legal[rows], action_values, -127).max(axis=1),
+            np.where(self.legal[rows], action_values, 127).min(axis=1),
+        )
+
+    def outcome(self, codes):
+        # 1 if X wins with best play from here, -1 if O does, 0 for a draw.
+        return np.sign(self.values[codes])
+
+    def blunders(self, codes, actions):
+        # True where playing `actions` gives away a better result.
+        return ~self.optimal[codes, actions]
+
+    def policy(self):
+        # One best move per board, quickest win first, as a uint8 table.
+        values = np.where(
+            (self.player == 1)[:, None], self.action_values, -self.action_values
+        )
+        actions = np.where(self.legal, values, -128).argmax(axis=1)
+        return np.where(self.legal.any(axis=1), actions, NO_ACTION).astype(np.uint8)
+
+
+@lru_cache(maxsize=None)
+def solver():
+    return Solver()
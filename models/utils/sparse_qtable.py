@@ -0,0 +1,160 @@
+import numpy as np
+from .policy_io import NO_ACTION
+from .random_stream import choose
+
+
+class SparseQTable:
+    # Action values for state spaces too large for a dense table. A dict maps
+    # a state key to a row of preallocated arrays, so memory is fixed by
+    # `capacity` rather than by the number of states. `legal(states)` gives
+    # the [n, num_actions] mask of legal moves; states without a row read as
+    # all zeros. Rows are only created by writes (set, or rows with
+    # insert=True), each of which counts as a visit; once the table passes
+    # `high_water` of its capacity, maintain() evicts the least-visited rows
+    # down to `low_water` and halves the remaining counts so that old visits
+    # fade. Arrays registered with attach() share the row layout and are
+    # cleared along with evicted rows.
+    def __init__(
+        self,
+        num_actions,
+        capacity,
+        legal,
+        dtype=np.float32,
+        num_states=None,
+        high_water=0.9,
+        low_water=0.75,
+    ):
+        self.num_actions = num_actions
+        self.capacity = capacity
+        self.legal = legal
+        self.num_states = num_states
+        self.high_water = high_water
+        self.low_water = low_water
+
+        shape = (capacity, num_actions)
+        self.values = np.zeros(shape, dtype=dtype)
+        self.visited = np.zeros(shape, dtype=bool)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        # The key stored in each row, -1 for free rows.
+        self.states = np.full(capacity, -1, dtype=np.int64)
+        self.index = {}
+        self.free = list(range(capacity - 1, -1, -1))
+        self.companions = []
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def nbytes(self):
+        return (
+            self.values.nbytes
+            + self.visited.nbytes
+            + self.counts.nbytes
+            + self.states.nbytes
+        )
+
+    def attach(self, array):
+        self.companions.append(array)
+
+    def rows(self, states, insert=False):
+        # Row of each state, -1 where it has none (or, with insert, where the
+        # table is full).
+        keys = np.asarray(states).tolist()
+        get = self.index.get
+        rows = np.fromiter((get(key, -1) for key in keys), np.int64, len(keys))
+        if insert:
+            for i in np.flatnonzero(rows < 0).tolist():
+                key = keys[i]
+                row = get(key, -1)
+                if row < 0 and self.free:
+                    row = self.free.pop()
+                    self.index[key] = row
+                    self.states[row] = key
+                rows[i] = row
+            np.add.at(self.counts, rows[rows >= 0], 1)
+        return rows
+
+    def lookup(self, states):
+        rows = self.rows(states)
+        values = np.where((rows >= 0)[:, None], self.values[rows], 0)
+        return rows, values
+
+    def greedy(self, states):
+        _, values = self.lookup(states)
+        return np.where(self.legal(states), values, -np.inf).argmax(axis=1)
+
+    def max_values(self, states):
+        # Best legal value per state; 0 for states without a row, with no
+        # legal move, or -1 ("no next state").
+        states = np.asarray(states)
+        rows, values = self.lookup(states)
+        legal = self.legal(np.maximum(states, 0))
+        best = np.where(legal, values, -np.inf).max(axis=1)
+        live = (rows >= 0) & legal.any(axis=1)
+        return np.where(live, best, 0)
+
+    def epsilon_greedy(self, states, epsilon, rng):
+        _, values = self.lookup(states)
+        legal = self.legal(states)
+        values = np.where(legal, values, -np.inf)
+        best = legal & (values == values.max(axis=1, keepdims=True))
+        probs = legal * (epsilon / legal.sum(axis=1, keepdims=True)) + best * (
+            (1.0 - epsilon) / best.sum(axis=1, keepdims=True)
+        )
+
+        actions = choose(rng, probs)
+        return actions, probs[np.arange(len(probs)), actions]
+
+    def get(self, states, actions):
+        rows = self.rows(states)
+        return np.where(rows >= 0, self.values[rows, actions], 0)
+
+    def set(self, states, actions, values):
+        rows = self.rows(states, insert=True)
+        kept = rows >= 0
+        rows, actions = rows[kept], np.asarray(actions)[kept]
+        self.values[rows, actions] = np.asarray(values)[kept]
+        self.visited[rows, actions] = True
+
+    def maintain(self):
+        # Call between batches, never while rows from rows() are in use.
+        if len(self.index) <= self.high_water * self.capacity:
+            return
+        used = np.flatnonzero(self.states >= 0)
+        excess = len(used) - int(self.low_water * self.capacity)
+        victims = used[np.argpartition(self.counts[used], excess - 1)[:excess]]
+        for key in self.states[victims].tolist():
+            del self.index[key]
+        self.states[victims] = -1
+        self.values[victims] = 0
+        self.visited[victims] = False
+        self.counts[victims] = 0
+        for array in self.companions:
+            array[victims] = 0
+        self.free.extend(victims.tolist())
+        self.counts //= 2
+        self.evicted += excess
+
+    def restore(self, values, visited, states=None, counts=None):
+        self.values[:] = values
+        self.visited[:] = visited
+        self.states[:] = states
+        self.counts[:] = 0 if counts is None else counts
+        used = np.flatnonzero(self.states >= 0)
+        self.index = dict(zip(self.states[used].tolist(), used.tolist()))
+        self.free = np.flatnonzero(self.states < 0)[::-1].tolist()
+
+    def policy(self):
+        # Greedy action over the visited actions of every visited state: a
+        # uint8 array indexed by state (NO_ACTION elsewhere) when states are
+        # dense codes below num_states, otherwise a {state: action} dict.
+        rows = np.flatnonzero(self.visited.any(axis=1))
+        actions = np.where(self.visited[rows], self.values[rows], -np.inf).argmax(
+            axis=1
+        )
+        if self.num_states is None:
+            return dict(zip(self.states[rows].tolist(), actions.tolist()))
+        policy = np.full(self.num_states, NO_ACTION, dtype=np.uint8)
+        policy[self.states[rows]] = actions
+        return policy
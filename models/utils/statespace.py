@@ -0,0 +1,80 @@
+from functools import lru_cache
+import numpy as np
+from .encoding import (
+    BOARD_SIZE,
+    NUM_CELLS,
+    POW3,
+    action_index,
+    all_boards,
+    decode_batch,
+    encode_batch,
+    index_action,
+)
+from .tables import winners
+
+# The 8 symmetries of the square (4 rotations, each optionally transposed)
+# as cell permutations: transformed.ravel() == board.ravel()[perm].
+# Transform 0 is the identity.
+_GRID = np.arange(NUM_CELLS).reshape(BOARD_SIZE, BOARD_SIZE)
+PERMUTATIONS = np.array(
+    [np.rot90(grid, k).ravel() for grid in (_GRID, _GRID.T) for k in range(4)]
+)
+INVERSES = np.argsort(PERMUTATIONS, axis=1)
+NUM_SYMMETRIES = len(PERMUTATIONS)
+
+_PERMUTATION_LIST = PERMUTATIONS.tolist()
+_INVERSE_LIST = INVERSES.tolist()
+
+
+@lru_cache(maxsize=None)
+def reachable_layers():
+    # Forward search from the empty board, one ply at a time. Layer n holds
+    # every reachable board with n pieces; play stops at won boards.
+    layer = np.array([0], dtype=np.int64)
+    layers = [layer]
+    for depth in range(NUM_CELLS):
+        boards = decode_batch(layer)
+        open_boards = winners(boards) == 0
+        boards, layer = boards[open_boards], layer[open_boards]
+        player = 1 if depth % 2 == 0 else 2
+        rows, cells = np.nonzero(boards == 0)
+        layer = np.unique(layer[rows] + player * POW3[cells])
+        layers.append(layer)
+    return tuple(layers)
+
+
+@lru_cache(maxsize=None)
+def reachable_states():
+    return np.sort(np.concatenate(reachable_layers()))
+
+
+@lru_cache(maxsize=None)
+def symmetry_tables():
+    boards = all_boards()
+    images = np.stack([encode_batch(boards[:, perm]) for perm in PERMUTATIONS], axis=1)
+    return images.min(axis=1), images.argmin(axis=1)
+
+
+@lru_cache(maxsize=None)
+def canonical_states():
+    codes, _ = symmetry_tables()
+    return np.unique(codes[reachable_states()])
+
+
+def canonical(code):
+    codes, transforms = symmetry_tables()
+    return int(codes[code]), int(transforms[code])
+
+
+def state_key(code, symmetry):
+    if symmetry:
+        return canonical(code)
+    return code, 0
+
+
+def canonical_action(action, transform):
+    return index_action(_INVERSE_LIST[transform][action_index(action)])
+
+
+def original_action(action, transform):
+    return index_action(_PERMUTATION_LIST[transform][action_index(action)])
@@ -0,0 +1,74 @@
+from functools import lru_cache
+import numpy as np
+from .encoding import NUM_CELLS, all_boards
+
+# Rows, columns and diagonals as cell indices, in the order TicTacToe.winner
+# checks them.
+# fmt: off
+LINES = np.array(
+    [
+        [0, 1, 2], [0, 3, 6],
+        [3, 4, 5], [1, 4, 7],
+        [6, 7, 8], [2, 5, 8],
+        [0, 4, 8], [2, 4, 6],
+    ]
+)
+# fmt: on
+# MDP.reward scans lines in three groups (i = 0, 1, 2) and within a group
+# checks threats for the mover before threats for the opponent.
+REWARD_GROUPS = [[0, 1, 6, 7], [2, 3], [4, 5]]
+
+
+def winners(boards):
+    cells = boards[:, LINES]
+    complete = (
+        (cells[:, :, 0] != 0)
+        & (cells[:, :, 0] == cells[:, :, 1])
+        & (cells[:, :, 1] == cells[:, :, 2])
+    )
+    first = np.argmax(complete, axis=1)
+    marks = cells[np.arange(len(boards)), first, 0]
+    return np.where(complete.any(axis=1), marks, 0)
+
+
+def shaped_rewards(boards, winner, players):
+    cells = boards[:, LINES]
+    empty = np.count_nonzero(cells == 0, axis=2) == 1
+    own = (np.count_nonzero(cells == players[:, None, None], axis=2) == 2) & empty
+    other = (
+        np.count_nonzero(cells == (3 - players)[:, None, None], axis=2) == 2
+    ) & empty
+
+    conditions = [winner == players, winner != 0]
+    choices = [1.0, -1.0]
+    for group in REWARD_GROUPS:
+        conditions += [own[:, group].any(axis=1), other[:, group].any(axis=1)]
+        choices += [0.5, -0.5]
+    return np.select(conditions, choices, default=0.0)
+
+
+class LookupTables:
+    # Per-board facts indexed by the base-3 encoding. shaped_reward[code, p]
+    # is MDP.reward(board, p); column 0 is unused.
+    def __init__(self):
+        boards = all_boards()
+        x_count = np.count_nonzero(boards == 1, axis=1)
+        o_count = np.count_nonzero(boards == 2, axis=1)
+        num_boards = len(boards)
+
+        self.valid = (x_count - o_count >= 0) & (x_count - o_count <= 1)
+        self.player = np.where(x_count == o_count, 1, 2).astype(np.int8)
+        self.winner = winners(boards).astype(np.int8)
+        self.empty = boards == 0
+        self.terminal = (self.winner != 0) | (x_count + o_count == NUM_CELLS)
+
+        self.shaped_reward = np.zeros((num_boards, 3))
+        for player in (1, 2):
+            self.shaped_reward[:, player] = shaped_rewards(
+                boards, self.winner, np.full(num_boards, player)
+            )
+
+
+@lru_cache(maxsize=None)
+def lookup_tables():
+    return LookupTables()
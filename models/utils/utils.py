@@ -1,8 +1,9 @@
 import numpy as np
-import tkinter as tk
-from tkinter import messagebox
 import os
 import random
+from .encoding import encode
+from .inference import PolicyEngine
+from .tables import lookup_tables
 
 
 class TicTacToe:
@@ -16,8 +17,12 @@ class TicTacToe:
             self.board = np.zeros((3, 3))
         self.game_over = False
         self.x_is_human = random.choice([True, False])
+        # A BackgroundTraining while the policy is still being learned.
+        self.training = None
 
     def create_board(self):
+        import tkinter as tk
+
         root = tk.Tk()
         root.title("Tic Tac Toe")
         root.resizable(0, 0)
@@ -46,8 +51,18 @@ class TicTacToe:
         self.reset_button = tk.Button(root, text="Reset", command=self.reset_game_gui)
         self.reset_button.grid(row=3, column=0, columnspan=3)
 
+        if self.training is not None:
+            status = tk.Label(root, background='white')
+            status.grid(row=4, column=0, columnspan=3)
+            self.show_training(root, status)
+
         root.mainloop()
 
+    def show_training(self, root, status):
+        status.configure(text=self.training.status())
+        if self.training.running():
+            root.after(250, self.show_training, root, status)
+
     def click(self, row, col):
         if self.game_over:
             return
@@ -92,24 +107,26 @@ class TicTacToe:
         return [(i, j) for i in range(3) for j in range(3) if board[i][j] == 0]
 
     def winner(self, board):
-        for i in range(3):
-            if board[i][0] == board[i][1] == board[i][2] != 0:
-                return board[i][0]
-            if board[0][i] == board[1][i] == board[2][i] != 0:
-                return board[0][i]
-        if board[0][0] == board[1][1] == board[2][2] != 0:
-            return board[0][0]
-        if board[0][2] == board[1][1] == board[2][0] != 0:
-            return board[0][2]
-        return None
+        winner = lookup_tables().winner[encode(board)]
+        return int(winner) if winner else None
 
     def terminal(self, board):
-        return self.winner(board) != None or len(self.possible_actions(board)) == 0
+        return bool(lookup_tables().terminal[encode(board)])
 
     def best_action(self):
         pass
 
+    def best_actions(self, boards):
+        # best_action over many boards (or encoded states) at once, as cell
+        # indices with -1 where there is no move.
+        engine = getattr(self, 'engine', None)
+        if engine is None or engine.policy is not self.policy:
+            engine = self.engine = PolicyEngine(self.policy)
+        return engine.actions(boards)
+
     def show_winner(self):
+        from tkinter import messagebox
+
         winner = self.winner(self.board)
         if winner == self.PLAYER_X:
             messagebox.showinfo("Game Over", "Player X wins!")
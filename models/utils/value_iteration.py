@@ -0,0 +1,89 @@
+import numpy as np
+from .encoding import NUM_CELLS, NUM_STATES, POW3
+from .tables import lookup_tables
+
+
+class ValueIteration:
+    def __init__(self, states=None):
+        tables = lookup_tables()
+
+        if states is None:
+            self.valid = tables.valid
+        else:
+            self.valid = np.zeros(NUM_STATES, dtype=bool)
+            self.valid[states] = True
+        self.player = tables.player
+        self.winner = tables.winner
+        self.terminal = tables.terminal
+        self.active = self.valid & ~self.terminal
+
+        codes = np.arange(NUM_STATES)
+        self.legal = tables.empty & self.active[:, None]
+        self.successors = np.where(
+            self.legal, codes[:, None] + self.player[:, None] * POW3, 0
+        )
+        self.rewards = tables.shaped_reward[codes, self.player]
+        self.states = np.flatnonzero(self.valid)
+        self.pieces = NUM_CELLS - np.count_nonzero(tables.empty, axis=1)
+
+    def initial_values(self):
+        V = np.zeros(NUM_STATES)
+        V[self.terminal & (self.winner == 1)] = 1
+        V[self.terminal & (self.winner == 2)] = -1
+        return V
+
+    def action_values(self, V, gamma):
+        return self.rewards[self.successors] + gamma * V[self.successors]
+
+    def sweep(self, V, gamma):
+        values = self.action_values(V, gamma)
+        best = np.where(
+            self.player == 1,
+            np.where(self.legal, values, -np.inf).max(axis=1),
+            np.where(self.legal, values, np.inf).min(axis=1),
+        )
+        new_V = np.where(self.active, best, V)
+        return new_V, np.abs(new_V - V).max()
+
+    def run(self, gamma=1, theta=1e-12, callback=None):
+        V = self.initial_values()
+        sweeps = 0
+        while True:
+            V, delta = self.sweep(V, gamma)
+            sweeps += 1
+            if callback is not None:
+                callback(sweeps, delta)
+            if delta < theta:
+                return V
+
+    def retrograde(self, gamma=1, callback=None):
+        # Exact values and greedy actions in one backward pass. Every move
+        # adds a piece, so boards with n pieces only depend on boards with
+        # n + 1: solving the layers from full boards down to the empty one
+        # gives the fixed point that run() converges to, without sweeping.
+        V = self.initial_values()
+        actions = np.full(NUM_STATES, -1)
+        for count in range(NUM_CELLS - 1, -1, -1):
+            layer = np.flatnonzero(self.active & (self.pieces == count))
+            successors = self.successors[layer]
+            values = self.rewards[successors] + gamma * V[successors]
+            legal = self.legal[layer]
+            best = np.where(
+                self.player[layer] == 1,
+                np.where(legal, values, -np.inf).argmax(axis=1),
+                np.where(legal, values, np.inf).argmin(axis=1),
+            )
+            V[layer] = values[np.arange(len(layer)), best]
+            actions[layer] = best
+            if callback is not None:
+                callback(count, len(layer))
+        return V, actions
+
+    def policy(self, V, gamma=1):
+        values = self.action_values(V, gamma)
+        actions = np.where(
+            self.player == 1,
+            np.where(self.legal, values, -np.inf).argmax(axis=1),
+            np.where(self.legal, values, np.inf).argmin(axis=1),
+        )
+        return np.where(self.active, actions, -1)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from models.mc import MonteCarlo
+from models.td import TemporalDifference
+from models.utils.checkpoint import read_checkpoint
+from models.utils.metrics import Metrics
+
+
+class Interrupt(Exception):
+    pass
+
+
+class InterruptAfter(Metrics):
+    # Stops training once `limit` episodes have been played.
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+        self.played = 0
+
+    def episodes(self, count, total_return, describe):
+        self.played += count
+        if self.played >= self.limit:
+            raise Interrupt
+
+
+@pytest.mark.parametrize('learner', [MonteCarlo, TemporalDifference])
+@pytest.mark.parametrize('interrupt_at', [2500, 5500])
+def test_resume_matches_uninterrupted_run(tmp_path, learner, interrupt_at):
+    # 8,000 episodes, 4,000 per seat: interrupted in X's or in O's turn.
+    path = str(tmp_path / 'checkpoint.npz')
+    settings = dict(num_episodes=8000, seed=3, checkpoint_every=1000)
+
+    straight = learner(pretrained=False)
+    straight.train(**settings)
+
+    interrupted = learner(pretrained=False)
+    with pytest.raises(Interrupt):
+        interrupted.train(
+            checkpoint_path=path, metrics=InterruptAfter(interrupt_at), **settings
+        )
+    _, meta = read_checkpoint(path)
+    saved = sum(meta['episodes'].values())
+    assert 0 < saved < interrupt_at
+
+    resumed = learner(pretrained=False)
+    resumed.train(checkpoint_path=path, resume=True, **settings)
+
+    assert resumed.episodes_done == straight.episodes_done
+    assert resumed.epsilon == straight.epsilon
+    for player in (1, 2):
+        assert np.array_equal(resumed.Q[player].values, straight.Q[player].values)
+        assert np.array_equal(resumed.Q[player].visited, straight.Q[player].visited)
+    assert np.array_equal(resumed.policy.dense(), straight.policy.dense())
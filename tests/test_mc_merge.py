@@ -0,0 +1,43 @@
+import numpy as np
+from models.mc import importance_sampling_sums, merge_importance_sampling
+from models.utils.encoding import NUM_STATES
+from models.utils.episodes import concatenate
+from models.utils.policy_io import NO_ACTION
+from models.utils.qtable import QTable
+from models.utils.random_stream import RandomStream
+from models.utils.simulator import BatchSimulator
+from models.utils.statespace import reachable_states
+
+
+def test_merged_worker_sums_match_single_process():
+    opponent = np.full(NUM_STATES, NO_ACTION, dtype=np.uint8)
+    for player in (1, 2):
+        behaviour = QTable(reachable_states())
+        behaviour.values[:] = np.random.default_rng(player).normal(
+            size=behaviour.values.shape
+        )
+        # Three workers' episodes, each from its own stream.
+        batches = [
+            BatchSimulator(opponent, rng=RandomStream(seed)).run(
+                behaviour, player, 300, 0.3
+            )
+            for seed in range(3)
+        ]
+
+        single = QTable(reachable_states())
+        single_C = np.zeros(single.values.shape)
+        weight_sum, return_sum = importance_sampling_sums(
+            single, concatenate(batches), 0.9
+        )
+        merge_importance_sampling(single, single_C, weight_sum, return_sum)
+
+        merged = QTable(reachable_states())
+        merged_C = np.zeros(merged.values.shape)
+        for batch in batches:
+            weight_sum, return_sum = importance_sampling_sums(merged, batch, 0.9)
+            merge_importance_sampling(merged, merged_C, weight_sum, return_sum)
+
+        assert single.visited.sum() > 1000
+        assert np.array_equal(merged.visited, single.visited)
+        assert np.allclose(merged_C, single_C)
+        assert np.allclose(merged.values, single.values, atol=1e-5)
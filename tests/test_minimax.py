@@ -0,0 +1,40 @@
+import numpy as np
+from models.minimax import Minimax
+from models.utils.encoding import decode
+from models.utils.solver import solver
+from models.utils.statespace import reachable_states
+from models.utils.tables import lookup_tables
+
+
+def live_states():
+    states = reachable_states()
+    return states[~lookup_tables().terminal[states]]
+
+
+def check_optimal(agent):
+    exact = solver()
+    states = live_states()
+    assert len(states) == 4520
+    moves = agent.best_actions(states)
+    assert exact.optimal[states, moves].all()
+    for state, move in zip(states.tolist(), moves.tolist()):
+        agent.board = decode(state)
+        row, col = agent.best_action()
+        assert row * 3 + col == move
+
+
+def test_shipped_table_plays_optimally():
+    check_optimal(Minimax())
+
+
+def test_solved_table_plays_optimally(tmp_path, monkeypatch):
+    monkeypatch.setattr(Minimax, 'TABLE_PATH', str(tmp_path / 'table.npz'))
+    agent = Minimax()
+    assert (tmp_path / 'table.npz').exists()
+    check_optimal(agent)
+    exact = solver()
+    for state in live_states()[::50].tolist():
+        value = agent.value(decode(state))
+        assert np.sign(value) == exact.outcome(state) * (
+            1 if lookup_tables().player[state] == 1 else -1
+        )
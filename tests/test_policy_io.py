@@ -0,0 +1,82 @@
+import pickle
+import numpy as np
+from main import main
+from models.utils.encoding import encode
+from models.utils.policy_io import (
+    ENCODING_BASE3,
+    ENCODING_REACHABLE,
+    NO_ACTION,
+    PolicyTable,
+    convert_policy,
+)
+from models.utils.solver import solver
+from models.utils.statespace import canonical_states, symmetry_tables
+
+
+def solver_policy(symmetry):
+    actions = solver().policy()
+    if symmetry:
+        # Keep the moves of canonical boards only, in their own frame.
+        kept = np.full(len(actions), NO_ACTION, dtype=np.uint8)
+        kept[canonical_states()] = actions[canonical_states()]
+        actions = kept
+    return PolicyTable(actions, 'mdp', symmetry)
+
+
+def test_save_load_round_trip(tmp_path):
+    for symmetry in (False, True):
+        policy = solver_policy(symmetry)
+        for encoding in (ENCODING_BASE3, ENCODING_REACHABLE):
+            path = str(tmp_path / f'{symmetry}-{encoding}.policy')
+            policy.save(path, encoding)
+            loaded = PolicyTable.load(path)
+            assert loaded.algorithm == 'mdp'
+            assert loaded.symmetry == symmetry
+            assert loaded.encoding == encoding
+            assert len(loaded) == len(policy)
+            assert np.array_equal(loaded.dense(), policy.dense())
+            assert np.array_equal(loaded.expanded(), policy.expanded())
+
+
+def test_symmetric_policy_answers_every_frame():
+    policy = solver_policy(True)
+    full = solver_policy(False)
+    codes, _ = symmetry_tables()
+    for state in np.flatnonzero(full.expanded() != NO_ACTION)[::37].tolist():
+        move = policy.action(state)
+        assert solver().optimal[state, move[0] * 3 + move[1]]
+        assert policy.action(int(codes[state])) is not None
+
+
+def test_convert_round_trips(tmp_path, capsys):
+    source = str(tmp_path / 'source.policy')
+    policy = solver_policy(True)
+    policy.save(source)
+    expanded = policy.expanded()
+
+    pickled = str(tmp_path / 'policy.pkl')
+    main(['convert', source, pickled])
+    assert capsys.readouterr().out.startswith('4,520 moves')
+    with open(pickled, 'rb') as f:
+        legacy = pickle.load(f)
+    assert len(legacy) == np.count_nonzero(expanded != NO_ACTION)
+    for board, (row, col) in list(legacy.items())[::97]:
+        assert expanded[encode(np.array(board))] == row * 3 + col
+
+    back = str(tmp_path / 'back.policy')
+    convert_policy(pickled, back, 'mdp')
+    assert np.array_equal(PolicyTable.load(back).expanded(), expanded)
+
+
+def test_convert_in_place_while_mapped(tmp_path):
+    path = str(tmp_path / 'policy.policy')
+    solver_policy(False).save(path)
+    mapped = PolicyTable.load(path)
+    before = np.array(mapped.actions)
+    convert_policy(path, path, encoding=ENCODING_REACHABLE)
+    # The old mapping still reads the old file.
+    assert np.array_equal(np.array(mapped.actions), before)
+    converted = PolicyTable.load(path)
+    assert converted.encoding == ENCODING_REACHABLE
+    assert np.array_equal(converted.expanded(), mapped.expanded())
+    assert [name.name for name in tmp_path.iterdir()] == ['policy.policy']
@@ -0,0 +1,27 @@
+import numpy as np
+from models.utils.encoding import all_boards
+from models.utils.tables import lookup_tables
+
+
+def scalar_winner(board):
+    # The original TicTacToe.winner: rows and columns, then the diagonals.
+    for i in range(3):
+        if board[i][0] == board[i][1] == board[i][2] != 0:
+            return board[i][0]
+        if board[0][i] == board[1][i] == board[2][i] != 0:
+            return board[0][i]
+    if board[0][0] == board[1][1] == board[2][2] != 0:
+        return board[0][0]
+    if board[0][2] == board[1][1] == board[2][0] != 0:
+        return board[0][2]
+    return None
+
+
+def test_tables_match_scalar_winner_and_terminal():
+    tables = lookup_tables()
+    for code, cells in enumerate(all_boards().tolist()):
+        board = [cells[0:3], cells[3:6], cells[6:9]]
+        winner = scalar_winner(board)
+        assert tables.winner[code] == (winner or 0)
+        assert tables.terminal[code] == (winner is not None or 0 not in cells)
+        assert np.array_equal(tables.empty[code], np.array(cells) == 0)
@@ -0,0 +1,78 @@
+import numpy as np
+from models.td import learn_batch, q_learning_update
+from models.utils.encoding import NUM_STATES
+from models.utils.policy_io import NO_ACTION
+from models.utils.qtable import QTable
+from models.utils.random_stream import RandomStream
+from models.utils.simulator import BatchSimulator
+from models.utils.statespace import reachable_states
+
+
+def sequential_learn_batch(Q, batch, alpha, gamma):
+    # The same updates as learn_batch, one sample at a time.
+    last_step = batch.states.shape[1] - 1
+    for t in range(last_step + 1):
+        for game in np.flatnonzero(t < batch.lengths):
+            next_state = (
+                batch.states[game, t + 1] if t + 1 < batch.lengths[game] else -1
+            )
+            q_learning_update(
+                Q,
+                batch.states[game, t : t + 1],
+                batch.actions[game, t : t + 1],
+                batch.rewards[game, t : t + 1],
+                np.array([next_state]),
+                alpha,
+                gamma,
+            )
+
+
+def test_repeated_pair_gets_every_update():
+    Q = QTable(reachable_states())
+    q_learning_update(
+        Q,
+        np.zeros(100, int),
+        np.zeros(100, int),
+        np.ones(100),
+        -np.ones(100, int),
+        0.1,
+        0.9,
+    )
+    assert np.isclose(Q.get([0], [0])[0], 1 - 0.9**100)
+
+
+def test_batch_update_matches_sequential_update():
+    # A random opponent (no moves in its table), so the games vary.
+    opponent = np.full(NUM_STATES, NO_ACTION, dtype=np.uint8)
+    simulator = BatchSimulator(opponent, rng=RandomStream(3))
+    for player in (1, 2):
+        batched = QTable(reachable_states())
+        batched.values[:] = np.random.default_rng(player).normal(
+            size=batched.values.shape
+        )
+        sequential = QTable(reachable_states())
+        sequential.values[:] = batched.values
+        batch = simulator.run(batched, player, 500, 0.5)
+
+        learn_batch(batched, batch, 0.1, 0.9)
+        sequential_learn_batch(sequential, batch, 0.1, 0.9)
+        assert np.allclose(batched.values, sequential.values, atol=1e-5)
+        assert np.array_equal(batched.visited, sequential.visited)
+
+
+def test_scalar_update_q():
+    from models.td import TemporalDifference
+    from models.utils.encoding import encode
+
+    for symmetry in (False, True):
+        agent = TemporalDifference(symmetry=symmetry, pretrained=False)
+        agent.prepare_training()
+        board = np.zeros((3, 3))
+        board[0, 2] = 1
+        board[1, 1] = 2
+        next_board = board.copy()
+        next_board[2, 0] = 1
+        next_board[0, 0] = 2
+        agent.update_Q(encode(board), (2, 0), 0.5, encode(next_board))
+        agent.update_Q(encode(next_board), (2, 2), 1.0, None)
+        assert np.isclose(agent.Q[1].values.sum(), 0.05 + 0.1)
@@ -0,0 +1,12 @@
+import numpy as np
+from models.utils.statespace import reachable_states
+from models.utils.value_iteration import ValueIteration
+
+
+def test_retrograde_matches_sweeps():
+    engine = ValueIteration(reachable_states())
+    for gamma in (1, 0.9):
+        swept = engine.run(gamma, 1e-12)
+        values, actions = engine.retrograde(gamma)
+        assert np.allclose(values, swept, atol=1e-9)
+        assert np.array_equal(actions, engine.policy(swept, gamma))